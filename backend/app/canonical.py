@@ -0,0 +1,97 @@
+import re
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# YouTube video ids are 11 characters from the URL-safe base64 alphabet.
+_YOUTUBE_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_YOUTUBE_HOSTS = {
+    "youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+    "youtube-nocookie.com", "www.youtube-nocookie.com",
+}
+# Path prefixes that carry the id as the next segment
+_YOUTUBE_PATH_KINDS = {"shorts", "embed", "live", "v", "e"}
+
+_INSTAGRAM_HOSTS = {"instagram.com", "www.instagram.com", "m.instagram.com", "instagr.am", "www.instagr.am"}
+# /reel/, /reels/, /p/ and /tv/ all address the same media by shortcode
+_INSTAGRAM_PATH_KINDS = {"p", "reel", "reels", "tv"}
+_INSTAGRAM_SHORTCODE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+EXTRACTORS = ("youtube", "instagram")
+
+
+class CanonicalKey(NamedTuple):
+    """Site-independent identity of a video: ``(extractor, video_id)``."""
+
+    extractor: str
+    video_id: str
+
+    @property
+    def url(self) -> str:
+        """The one URL form we hand to yt-dlp for this video."""
+        if self.extractor == "youtube":
+            return f"https://www.youtube.com/watch?v={self.video_id}"
+        return f"https://www.instagram.com/p/{self.video_id}/"
+
+    def __str__(self) -> str:
+        return f"{self.extractor}:{self.video_id}"
+
+
+def _youtube_id(host: str, path: str, query: str) -> Optional[str]:
+    segments = [s for s in path.split("/") if s]
+    if host == "youtu.be":
+        candidate = segments[0] if segments else None
+    elif host in _YOUTUBE_HOSTS:
+        if segments and segments[0] == "watch":
+            candidate = (parse_qs(query).get("v") or [None])[0]
+        elif len(segments) >= 2 and segments[0] in _YOUTUBE_PATH_KINDS:
+            candidate = segments[1]
+        else:
+            candidate = None
+    else:
+        return None
+    if candidate and _YOUTUBE_ID.match(candidate):
+        return candidate
+    return None
+
+
+def _instagram_id(host: str, path: str) -> Optional[str]:
+    if host not in _INSTAGRAM_HOSTS:
+        return None
+    segments = [s for s in path.split("/") if s]
+    # Also accept profile-scoped links: /<username>/reel/<shortcode>/
+    for i, segment in enumerate(segments[:-1]):
+        if segment in _INSTAGRAM_PATH_KINDS and _INSTAGRAM_SHORTCODE.match(segments[i + 1]):
+            return segments[i + 1]
+    return None
+
+
+def canonicalize(url: str) -> Optional[CanonicalKey]:
+    """Map any supported URL shape to its canonical key.
+
+    Handles youtu.be, m./music./nocookie hosts, /shorts/, /embed/, /live/
+    and tracking or playlist query parameters for YouTube, and /reel/,
+    /reels/, /p/ and /tv/ links for Instagram.  Returns None for URLs we
+    can't identify — those are passed to yt-dlp unchanged.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    host = (parts.hostname or "").lower()
+
+    video_id = _youtube_id(host, parts.path, parts.query)
+    if video_id:
+        return CanonicalKey("youtube", video_id)
+    shortcode = _instagram_id(host, parts.path)
+    if shortcode:
+        return CanonicalKey("instagram", shortcode)
+    return None
+
+
+def canonical_url(url: str) -> str:
+    """Canonical URL for *url*, or *url* itself when it isn't recognised."""
+    key = canonicalize(url)
+    return key.url if key else url
@@ -57,7 +57,11 @@ class FileCleanupService:
     async def _cleanup(self):
         """Remove files and job records older than the retention period."""
         # Import here to avoid a circular import at module load time
-        from .converter import jobs
+        from .converter import converter, jobs
+        from .journal import get_journal
+        from .scheduler import get_scheduler
+        from .speculation import get_speculator, speculation_enabled
+        from .watchdog import get_watchdog
 
         cutoff = datetime.now() - timedelta(hours=self.retention_hours)
 
@@ -77,31 +81,43 @@ class FileCleanupService:
                     logger.error(f"Error deleting {file_path}: {e}")
 
         # ── 2. Evict stale job records ─────────────────────────────────────
-        # Terminal jobs (completed/failed) whose file no longer exists.
-        # Orphaned jobs stuck in pending/processing past 2× the retention window
-        # (can happen if the server restarted mid-conversion).
+        # Completed jobs whose file no longer exists.  Failed jobs (which
+        # never have a file) and orphaned jobs stuck in pending/processing
+        # past 2× the retention window (can happen if the server restarted
+        # mid-conversion).  A long job still holding a scheduler slot or
+        # being watched is not an orphan, however old it is.
         orphan_cutoff = datetime.now() - timedelta(hours=self.retention_hours * 2)
+        orphan_cutoff_ts = orphan_cutoff.timestamp()
+        live_ids = get_scheduler().job_ids() | get_watchdog().watched_ids()
+        if speculation_enabled():
+            live_ids |= get_speculator().scratch_ids()
         stale_ids = []
         for job_id, job in list(jobs.items()):
-            is_terminal = job.status in ("completed", "failed")
-            file_gone = not job.file_path or not Path(job.file_path).exists()
-
-            if is_terminal and file_gone:
+            if job.status == "completed":
+                if not job.file_path or not Path(job.file_path).exists():
+                    stale_ids.append(job_id)
+            elif job.created < orphan_cutoff_ts and job_id not in live_ids:
                 stale_ids.append(job_id)
-            elif not is_terminal and job.created_at:
-                try:
-                    created = datetime.fromisoformat(job.created_at)
-                    if created < orphan_cutoff:
-                        stale_ids.append(job_id)
-                except ValueError:
-                    pass
+
+        # Snapshot in-flight jobs before evicting anything, so a job that
+        # is still running never loses its scratch directory.
+        active_ids = live_ids | {
+            job_id for job_id, job in jobs.items() if not job.is_terminal
+        }
         for job_id in stale_ids:
             jobs.pop(job_id, None)
+        get_journal().forget(stale_ids)
+
+        # ── 3. Sweep abandoned scratch directories ─────────────────────────
+        # Jobs remove their own scratch dir when they finish; anything left
+        # that isn't an in-flight job's is debris from a crash.
+        scratch_removed = converter.scratch.sweep(orphan_cutoff, active_ids)
 
-        if files_deleted or stale_ids:
+        if files_deleted or stale_ids or scratch_removed:
             logger.info(
                 f"Cleanup: {files_deleted} file(s) deleted, "
-                f"{len(stale_ids)} job record(s) evicted"
+                f"{len(stale_ids)} job record(s) evicted, "
+                f"{scratch_removed} scratch dir(s) removed"
             )
 
 
@@ -0,0 +1,381 @@
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import httpx
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from .canonical import canonicalize
+
+logger = logging.getLogger(__name__)
+
+# Marks a request one node passed to another; such requests are always
+# served where they land, so nodes with diverging membership can't loop.
+FORWARDED_HEADER = "X-Reelo-Forwarded"
+
+# Client headers the owning node needs: body type, the caller's API key
+# for fair-share scheduling, the public host (embedded in file metadata)
+# and conditional/range requests.  X-Real-IP is set from the client IP the
+# forwarding node resolved.
+_FORWARD_REQUEST_HEADERS = (
+    "content-type", "host", "x-api-key", "x-forwarded-for",
+    "x-forwarded-proto", "if-none-match", "range",
+)
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+# Node names become job id prefixes ("<node>-<uuid>") and nginx upstream names
+_NODE_NAME = re.compile(r'^[a-z0-9]+$')
+
+
+class NodeUnavailable(Exception):
+    """Raised when a request can't be forwarded to the node that owns it."""
+
+    def __init__(self, node: str, reason: str):
+        super().__init__(f"Cluster node {node} unavailable: {reason}")
+        self.node = node
+
+
+class ClusterNode(NamedTuple):
+    name: str
+    url: str  # Base URL other nodes reach it at, e.g. http://10.0.0.2:8000
+
+
+def parse_nodes(spec: str) -> List[ClusterNode]:
+    """Parse CLUSTER_NODES: comma-separated ``name=url`` entries.
+
+    A bare ``url`` gets a name derived from it, so every node computes the
+    same names from the same list.
+    """
+    nodes = []
+    for entry in (e.strip() for e in spec.split(",")):
+        if not entry:
+            continue
+        name, sep, url = entry.partition("=")
+        if not sep:
+            name, url = "n" + hashlib.sha1(entry.encode()).hexdigest()[:6], entry
+        name, url = name.strip().lower(), url.strip().rstrip("/")
+        if not _NODE_NAME.match(name):
+            raise ValueError(f"Invalid cluster node name {name!r} (use lowercase letters and digits)")
+        nodes.append(ClusterNode(name, url))
+    names = [n.name for n in nodes]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate cluster node names in CLUSTER_NODES")
+    return nodes
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring over node names.
+
+    Each node owns *vnodes* points on the ring, which evens out the key
+    split; adding or removing a node only moves the keys of the arcs it
+    gains or loses, so the other nodes keep their cached videos.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        if not nodes:
+            raise ValueError("HashRing needs at least one node")
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[i]
+
+
+def routing_key(url: str) -> str:
+    """Affinity key for a video URL: its canonical key, so every link shape
+    for one video maps to the same node (unrecognised URLs by themselves)."""
+    key = canonicalize(url)
+    return str(key) if key else url.strip()
+
+
+class Cluster:
+    """Video-id affinity across several Reelo nodes.
+
+    Every video (by canonical key) has one owning node on a consistent hash
+    ring.  Requests for a video that reach another node — /info and
+    /convert — are forwarded to the owner, so its metadata, downloaded
+    sources and outputs stay on one node.  Job ids carry the name of the
+    node that runs them (``<node>-<uuid>``), which routes /status and
+    /download back to that node — by nginx directly with the generated
+    config, or by a forward here otherwise.
+    """
+
+    def __init__(self, nodes: List[ClusterNode], self_name: str, vnodes: int = 64,
+                 timeout: float = 60.0):
+        self.nodes: Dict[str, ClusterNode] = {n.name: n for n in nodes}
+        if self_name not in self.nodes:
+            raise ValueError(f"CLUSTER_SELF {self_name!r} is not in CLUSTER_NODES")
+        self.self_name = self_name
+        self.ring = HashRing(list(self.nodes), vnodes)
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._forwarded: Counter = Counter()
+        self._failed: Counter = Counter()
+
+    def new_job_id(self) -> str:
+        return f"{self.self_name}-{uuid.uuid4()}"
+
+    def owner(self, url: str) -> ClusterNode:
+        return self.nodes[self.ring.node_for(routing_key(url))]
+
+    def job_node(self, job_id: str) -> Optional[ClusterNode]:
+        """Node a job id was issued by (None for ids without a known prefix)."""
+        name, sep, _ = job_id.partition("-")
+        return self.nodes.get(name) if sep else None
+
+    def remote(self, req: Request, node: Optional[ClusterNode]) -> Optional[ClusterNode]:
+        """*node* if *req* should be forwarded there, else None."""
+        if node is None or node.name == self.self_name or FORWARDED_HEADER.lower() in req.headers:
+            return None
+        return node
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._client
+
+    async def forward(self, req: Request, node: ClusterNode, body: Optional[bytes] = None,
+                      client_ip: Optional[str] = None) -> Response:
+        """Replay *req* on *node* and stream its response back unchanged.
+
+        *client_ip* is passed on as X-Real-IP; the other nodes must be in
+        the receiving node's TRUSTED_PROXIES to honour it.  Raises
+        NodeUnavailable when the node can't be reached.
+        """
+        headers = {name: req.headers[name] for name in _FORWARD_REQUEST_HEADERS if name in req.headers}
+        if client_ip:
+            headers["x-real-ip"] = client_ip
+        headers[FORWARDED_HEADER] = self.self_name
+
+        client = self._get_client()
+        upstream_req = client.build_request(
+            req.method, f"{node.url}{req.url.path}",
+            params=req.url.query or None, headers=headers, content=body,
+        )
+        try:
+            upstream = await client.send(upstream_req, stream=True)
+        except httpx.TransportError as e:
+            self._failed[node.name] += 1
+            raise NodeUnavailable(node.name, str(e) or type(e).__name__)
+        self._forwarded[node.name] += 1
+
+        response_headers = {
+            name: value for name, value in upstream.headers.items()
+            if name.lower() not in _HOP_BY_HOP
+        }
+        # Raw bytes: a compressed body is passed through with its own
+        # Content-Encoding / Content-Length.
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            background=BackgroundTask(upstream.aclose),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "self": self.self_name,
+            "nodes": {n.name: n.url for n in self.nodes.values()},
+            "forwarded": dict(self._forwarded),
+            "forward_failures": dict(self._failed),
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_cluster: Cluster | None = None
+_configured = False
+
+
+def get_cluster() -> Cluster | None:
+    """Return (or create) the global cluster view; None unless CLUSTER_NODES
+    lists more than one node.
+
+    Raises ValueError for an invalid cluster config — called at startup so
+    a misconfigured node refuses to start instead of silently serving as a
+    single node outside the ring.
+    """
+    global _cluster, _configured
+    if not _configured:
+        nodes = parse_nodes(os.getenv("CLUSTER_NODES", ""))
+        if len(nodes) >= 2:
+            _cluster = Cluster(
+                nodes,
+                self_name=os.getenv("CLUSTER_SELF", "").strip().lower(),
+                vnodes=int(os.getenv("CLUSTER_VNODES", "64")),
+                timeout=float(os.getenv("CLUSTER_FORWARD_TIMEOUT", "60")),
+            )
+            logger.info(f"Cluster mode: node {_cluster.self_name} of {', '.join(_cluster.nodes)}")
+        # Only once the config is known to be valid
+        _configured = True
+    return _cluster
+
+
+async def close_cluster():
+    """Close the forwarding client (called at shutdown)."""
+    if _cluster is not None:
+        await _cluster.close()
+
+
+# ── nginx config ───────────────────────────────────────────────────────────────
+NGINX_BEGIN = "# BEGIN reelo upstreams"
+NGINX_END = "# END reelo upstreams"
+
+
+def _upstream_server(url: str) -> str:
+    return re.sub(r'^[a-z]+://', '', url).rstrip("/")
+
+
+def nginx_upstreams(nodes: List[ClusterNode]) -> str:
+    """Upstream blocks for deployment/nginx.conf from the node list.
+
+    Job-scoped paths (/api/status/<node>-..., /api/download/<node>-...) go
+    straight to the node named in the job id via $reelo_backend.  Requests
+    keyed by video go to any node, which forwards them to the video's owner
+    if needed — the ring lives in the app, so nginx never needs it.
+    """
+    lines = [
+        NGINX_BEGIN,
+        f"# Generated by `python -m app.cluster nginx` for nodes: {', '.join(n.name for n in nodes)}",
+        "upstream ytconverter_backend {",
+        *(f"    server {_upstream_server(n.url)};" for n in nodes),
+        "}",
+    ]
+    for n in nodes:
+        lines += [f"upstream reelo_node_{n.name} {{", f"    server {_upstream_server(n.url)};", "}"]
+    lines += [
+        "",
+        "# Jobs run on the node that created them; their id starts with its name",
+        "map $uri $reelo_backend {",
+        "    default ytconverter_backend;",
+        *(f"    ~^/api/(status|download)/{n.name}- reelo_node_{n.name};" for n in nodes),
+        "}",
+        NGINX_END,
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_nginx_config(path: Path, nodes: List[ClusterNode]):
+    """Replace the marked upstream section of an nginx config in place."""
+    text = path.read_text()
+    start, end = text.find(NGINX_BEGIN), text.find(NGINX_END)
+    if start < 0 or end < start:
+        raise ValueError(f"{path} has no '{NGINX_BEGIN}' ... '{NGINX_END}' section")
+    end += len(NGINX_END) + 1
+    path.write_text(text[:start] + nginx_upstreams(nodes) + text[end:])
+
+
+# ── Local multi-process launcher ───────────────────────────────────────────────
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def launch_local(count: int, base_port: int, workdir: Path, extra_args: List[str]) -> int:
+    """Run *count* nodes on 127.0.0.1:base_port.. as one cluster, each with
+    its own download dir and journal under *workdir*, until interrupted."""
+    backend_dir = Path(__file__).resolve().parent.parent
+    nodes = [ClusterNode(f"n{i + 1}", f"http://127.0.0.1:{base_port + i}") for i in range(count)]
+    spec = ",".join(f"{n.name}={n.url}" for n in nodes)
+
+    procs = []
+    for node, port in zip(nodes, range(base_port, base_port + count)):
+        node_dir = workdir / node.name
+        node_dir.mkdir(parents=True, exist_ok=True)
+        env = {
+            **os.environ,
+            "CLUSTER_NODES": spec,
+            "CLUSTER_SELF": node.name,
+            "DOWNLOAD_DIR": str(node_dir / "downloads"),
+            "JOB_JOURNAL_PATH": str(node_dir / "jobs.sqlite3"),
+        }
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app",
+             "--host", "127.0.0.1", "--port", str(port), *extra_args],
+            cwd=str(backend_dir),
+            env=env,
+        ))
+        print(f"{node.name}: {node.url}  (state in {node_dir})")
+    print(f"CLUSTER_NODES={spec}\nSend requests to any node; Ctrl-C stops the cluster.")
+
+    # Stop the nodes on SIGTERM too, not only Ctrl-C
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        while all(p.poll() is None for p in procs):
+            time.sleep(0.5)
+        print("A node exited, stopping the cluster")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.send_signal(signal.SIGINT)
+        for p in procs:
+            try:
+                p.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                p.kill()
+    return max((p.returncode or 0) for p in procs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cluster", description="Reelo cluster tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    nginx = sub.add_parser("nginx", help="Generate nginx upstreams from the node list")
+    nginx.add_argument("--nodes", default=os.getenv("CLUSTER_NODES", ""),
+                       help="name=url,... (default: $CLUSTER_NODES)")
+    nginx.add_argument("--write", type=Path, metavar="NGINX_CONF",
+                       help="Update the marked section of this file instead of printing")
+
+    launch = sub.add_parser("launch", help="Run a local cluster of several processes")
+    launch.add_argument("--nodes", type=int, default=3)
+    launch.add_argument("--base-port", type=int, default=8001)
+    launch.add_argument("--workdir", type=Path, default=Path("./cluster-local"))
+    launch.add_argument("uvicorn_args", nargs=argparse.REMAINDER,
+                        help="Extra uvicorn arguments (after --)")
+
+    args = parser.parse_args(argv)
+    if args.command == "nginx":
+        nodes = parse_nodes(args.nodes)
+        if not nodes:
+            parser.error("no nodes given (--nodes or CLUSTER_NODES)")
+        if args.write:
+            write_nginx_config(args.write, nodes)
+        else:
+            sys.stdout.write(nginx_upstreams(nodes))
+        return 0
+    extra = [a for a in args.uvicorn_args if a != "--"]
+    return launch_local(args.nodes, args.base_port, args.workdir.resolve(), extra)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from . import sysstats
+from .scheduler import FairScheduler, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def max_slots_from_env() -> int:
+    """Upper bound on concurrent job slots (CONCURRENCY_MAX_SLOTS).
+
+    Defaults to the number of usable cores, but never below the configured
+    starting value MAX_CONCURRENT_JOBS.  The download executor is sized from
+    this so the controller can always raise the limit up to the bound.
+    """
+    initial = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+    default = max(initial, sysstats.effective_cpu_count())
+    return max(int(os.getenv("CONCURRENCY_MAX_SLOTS", str(default))), 1)
+
+
+class ConcurrencyController:
+    """AIMD controller for the scheduler's concurrent job slots.
+
+    Every ``interval`` seconds it samples CPU utilisation, memory usage and
+    inbound network throughput, then:
+
+      - halves the slot count (down to ``min_slots``) when memory is above
+        its high-water mark, or CPU is while jobs are queued — multiplicative
+        decrease.  Busy CPU with an empty queue is just the running jobs'
+        ffmpeg using the threads the CPU budget gave them; fewer slots
+        wouldn't lower it, only hold back the next jobs;
+      - holds steady when the configured link bandwidth is saturated, since
+        more parallel downloads would only split the same pipe;
+      - adds one slot (up to ``max_slots``) when jobs are queued, every slot
+        is busy and CPU / memory are below their low-water marks — additive
+        increase.
+
+    Download and transcode happen inside the same yt-dlp call, so one slot
+    covers both.  Decisions are logged and kept in a short history for the
+    /api/concurrency endpoint.
+    """
+
+    def __init__(
+        self,
+        scheduler: FairScheduler,
+        min_slots: int = 1,
+        max_slots: int = 2,
+        cpu_high: float = 0.85,
+        cpu_low: float = 0.60,
+        mem_high: float = 0.85,
+        mem_low: float = 0.70,
+        net_limit_bytes: float = 0,
+        interval: float = 10,
+    ):
+        self.scheduler = scheduler
+        self.min_slots = max(min_slots, 1)
+        self.max_slots = max(max_slots, self.min_slots)
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.mem_high = mem_high
+        self.mem_low = mem_low
+        self.net_limit_bytes = net_limit_bytes
+        self.interval = interval
+        self.cores = sysstats.effective_cpu_count()
+        self.last_sample: dict = {}
+        self.decisions: deque = deque(maxlen=50)
+        self._prev_cpu: Optional[tuple] = None
+        self._prev_net: Optional[tuple] = None
+        self._stop_event = asyncio.Event()
+
+    async def start(self):
+        """Sample and adjust on a fixed interval until stop() is called."""
+        logger.info(
+            f"Concurrency controller started "
+            f"(slots: {self.scheduler.capacity}, bounds: {self.min_slots}-{self.max_slots}, "
+            f"cores: {self.cores})"
+        )
+        while not self._stop_event.is_set():
+            try:
+                self.adjust(self.sample())
+            except Exception as e:
+                logger.error(f"Concurrency controller error: {e}")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Concurrency controller stopped")
+
+    def stop(self):
+        """Signal the control loop to exit cleanly."""
+        self._stop_event.set()
+
+    def sample(self) -> dict:
+        """Take one resource reading.  Rates are deltas since the last call."""
+        sample: dict = {
+            "memory": sysstats.memory_usage_fraction(),
+            "rss_bytes": sysstats.process_rss_bytes(),
+            "cpu": None,
+            "net_bytes_per_sec": None,
+        }
+
+        cpu = sysstats.cpu_time_seconds()
+        if cpu and self._prev_cpu:
+            busy = cpu[0] - self._prev_cpu[0]
+            elapsed = cpu[1] - self._prev_cpu[1]
+            if elapsed > 0:
+                sample["cpu"] = min(busy / (elapsed * cpu[2]), 1.0)
+        self._prev_cpu = cpu
+
+        net = sysstats.network_bytes_received()
+        now = time.monotonic()
+        if net is not None and self._prev_net:
+            elapsed = now - self._prev_net[1]
+            if elapsed > 0:
+                sample["net_bytes_per_sec"] = (net - self._prev_net[0]) / elapsed
+        self._prev_net = (net, now) if net is not None else None
+
+        self.last_sample = sample
+        return sample
+
+    def adjust(self, sample: dict):
+        """Apply one AIMD step to the scheduler's capacity."""
+        current = self.scheduler.capacity
+        cpu = sample.get("cpu")
+        mem = sample.get("memory")
+        net = sample.get("net_bytes_per_sec")
+        stats = self.scheduler.stats()
+
+        target, reason = current, None
+        cpu_overloaded = cpu is not None and cpu > self.cpu_high and stats["queued"] > 0
+        if cpu_overloaded or (mem is not None and mem > self.mem_high):
+            target = max(self.min_slots, current // 2)
+            reason = "overloaded"
+        elif self.net_limit_bytes and net is not None and net > 0.9 * self.net_limit_bytes:
+            reason = "bandwidth saturated"
+        elif (
+            stats["queued"] > 0
+            and stats["running"] >= current
+            and (cpu is None or cpu < self.cpu_low)
+            and (mem is None or mem < self.mem_low)
+        ):
+            target = min(self.max_slots, current + 1)
+            reason = "backlog with headroom"
+
+        if target != current:
+            self.scheduler.set_capacity(target)
+            decision = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "from": current,
+                "to": target,
+                "reason": reason,
+                "cpu": None if cpu is None else round(cpu, 3),
+                "memory": None if mem is None else round(mem, 3),
+                "net_bytes_per_sec": None if net is None else int(net),
+            }
+            self.decisions.append(decision)
+            logger.info(
+                f"Concurrency {current} -> {target} slots ({reason}; "
+                f"cpu={decision['cpu']}, mem={decision['memory']}, net={decision['net_bytes_per_sec']}B/s)"
+            )
+
+    def status(self) -> dict:
+        """Current limit, bounds, last sample and recent decisions."""
+        return {
+            "slots": self.scheduler.capacity,
+            "min_slots": self.min_slots,
+            "max_slots": self.max_slots,
+            "cores": self.cores,
+            "scheduler": self.scheduler.stats(),
+            "last_sample": self.last_sample,
+            "decisions": list(self.decisions),
+        }
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_controller: ConcurrencyController | None = None
+
+
+def get_concurrency_controller() -> ConcurrencyController:
+    """Return (or create) the global concurrency controller."""
+    global _controller
+    if _controller is None:
+        net_mbps = float(os.getenv("CONCURRENCY_NET_LIMIT_MBPS", "0"))
+        _controller = ConcurrencyController(
+            get_scheduler(),
+            min_slots=int(os.getenv("CONCURRENCY_MIN_SLOTS", "1")),
+            max_slots=max_slots_from_env(),
+            cpu_high=float(os.getenv("CONCURRENCY_CPU_HIGH", "0.85")),
+            cpu_low=float(os.getenv("CONCURRENCY_CPU_LOW", "0.60")),
+            mem_high=float(os.getenv("CONCURRENCY_MEMORY_HIGH", "0.85")),
+            mem_low=float(os.getenv("CONCURRENCY_MEMORY_LOW", "0.70")),
+            net_limit_bytes=net_mbps * 125_000,  # Mbit/s -> bytes/s
+            interval=float(os.getenv("CONCURRENCY_INTERVAL_SECONDS", "10")),
+        )
+    return _controller
@@ -1,64 +1,76 @@
 import os
 import random
-import gc
 import uuid
 import asyncio
-import ctypes
 import yt_dlp
-import re
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+import time
 import logging
 
 from .models import FormatType, VideoInfo, JobStatus
+from .jobs import JobRecord
+from .watchdog import get_watchdog, DownloadStalled
+from .throttle import get_instagram_throttle
+from .scheduler import get_scheduler
+from .costs import estimate_job_cost
+from .concurrency import max_slots_from_env
+from .cpubudget import get_cpu_budget
+from .memory import get_memory_governor
+from .speculation import get_speculator, speculation_enabled
+from .journal import get_journal
+from .scratch import ScratchSpace
+from .canonical import CanonicalKey, canonical_url, canonicalize
+from .cluster import get_cluster
+from .tracing import current_job, get_tracer
+from .progress import ProgressTracker
+from .multioutput import MultiOutputEncodePP, output_name, source_format
+from .images import (
+    IMAGE_EXTENSIONS,
+    convert_image_bytes,
+    convert_image_file,
+    fetch_thumbnail,
+    get_image_executor,
+    get_thumbnail_cache,
+    is_image_format,
+    write_image_artifact,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def _release_memory():
-    """Force Python to release unused heap memory back to the OS.
+# Job storage (in production, use Redis or a database).  Compact records —
+# converted to the JobStatus model only when served (see get_job_status).
+jobs: Dict[str, JobRecord] = {}
 
-    Python's allocator (pymalloc) keeps freed objects in an internal pool
-    and never returns them to the OS on its own.  After a large job:
-      1. gc.collect() — frees any reference-cycle garbage
-      2. malloc_trim(0) — tells glibc to return the now-empty pages to the OS
-    This is Linux-only (no-op on other platforms) and safe to call anytime.
-    """
-    gc.collect()
-    try:
-        ctypes.CDLL('libc.so.6').malloc_trim(0)
-    except Exception:
-        pass  # Non-Linux (Windows/macOS dev machines) — silently skip
+# ── Bounded thread pool ────────────────────────────────────────────────────────
+# Concurrent downloads are admitted by the fair-share scheduler (see
+# scheduler.py), whose slot count the concurrency controller moves between
+# CONCURRENCY_MIN_SLOTS and CONCURRENCY_MAX_SLOTS so the container doesn't OOM.
+# The pool is sized for the upper bound (threads are only spawned on demand)
+# plus two extra threads so metadata lookups for /api/info and for queued jobs
+# never wait behind long-running downloads.
+_EXECUTOR_WORKERS = max_slots_from_env() + 2
+_executor = ThreadPoolExecutor(max_workers=_EXECUTOR_WORKERS, thread_name_prefix="yt-dlp")
 
-# Job storage (in production, use Redis or a database)
-jobs: Dict[str, JobStatus] = {}
 
-# ── Bounded thread pool ────────────────────────────────────────────────────────
-# Limits concurrent yt-dlp / ffmpeg processes so the container doesn't OOM when
-# multiple users hit the API simultaneously.  2 workers = 2 concurrent downloads.
-_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="yt-dlp")
+def download_executor() -> ThreadPoolExecutor:
+    """The current download worker pool (it is swapped when recycled)."""
+    return _executor
 
 
-def normalize_youtube_url(url: str) -> str:
-    """
-    Convert YouTube Shorts URLs to standard watch URLs.
-    Example: youtube.com/shorts/Ir02lSLUmSQ -> youtube.com/watch?v=Ir02lSLUmSQ
-    """
-    shorts_pattern = r'(?:youtube\.com/shorts/)([^&\s?]+)'
-    match = re.search(shorts_pattern, url)
-
-    if match:
-        video_id = match.group(1)
-        # Preserve protocol if present
-        if url.startswith('http://') or url.startswith('https://'):
-            protocol = url.split('://')[0] + '://'
-        else:
-            protocol = 'https://'
-        return f"{protocol}www.youtube.com/watch?v={video_id}"
+def _recycle_executor():
+    """Swap in a fresh worker pool; the old one retires once its jobs finish.
 
-    return url
+    Called when the memory governor decides the long-lived worker threads
+    have accumulated enough per-thread state to be worth replacing.
+    """
+    global _executor
+    old = _executor
+    _executor = ThreadPoolExecutor(max_workers=_EXECUTOR_WORKERS, thread_name_prefix="yt-dlp")
+    old.shutdown(wait=False)
 
 
 def _is_instagram(url: str) -> bool:
@@ -66,6 +78,34 @@ def _is_instagram(url: str) -> bool:
     return any(domain in url for domain in ('instagram.com', 'instagr.am'))
 
 
+def _thumbnail_key(url: str, video_info: VideoInfo) -> CanonicalKey:
+    """Thumbnail cache key for a video: its canonical key when the URL is
+    recognised, otherwise yt-dlp's extractor name and id."""
+    return canonicalize(url) or CanonicalKey(video_info.extractor or "generic", video_info.video_id)
+
+
+@contextmanager
+def _instagram_throttled(instagram: bool, job_id: Optional[str] = None):
+    """Wrap one blocking Instagram request in the process-wide throttle.
+
+    Waits for a slot before the body runs and reports 403/429 failures back
+    so the throttle can back off.  A no-op for non-Instagram URLs.  Must be
+    entered from a worker thread — acquire() may sleep.  The wait doesn't
+    count against *job_id*'s watchdog deadline.
+    """
+    if not instagram:
+        yield
+        return
+    throttle = get_instagram_throttle()
+    with get_watchdog().paused(job_id):
+        throttle.acquire()
+    try:
+        yield
+    except Exception as e:
+        throttle.record_failure(e)
+        raise
+
+
 # ── Instagram anti-detection constants ─────────────────────────────────────────
 # A pool of recent, real-world Chrome User-Agent strings.  We pick one at random
 # per request so that repeated downloads don't share a single fingerprint.
@@ -83,6 +123,10 @@ class VideoConverter:
     def __init__(self, download_dir: str = "./downloads"):
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
+        # All intermediate work happens here; only finished artifacts are
+        # published into download_dir (see scratch.py).
+        scratch_root = os.getenv("SCRATCH_DIR") or self.download_dir / ".scratch"
+        self.scratch = ScratchSpace(Path(scratch_root), self.download_dir)
 
     # ── Instagram-specific option overrides ──────────────────────────────────
     @staticmethod
@@ -103,14 +147,6 @@ class VideoConverter:
                 'Accept-Language': 'en-US,en;q=0.9',
             },
 
-            # ── Rate-limiting / stealth ────────────────────────────────────
-            # Pause between metadata API calls to stay under the anonymous
-            # rate-limit window.
-            'sleep_requests': 1.5,
-            # Random pre-download delay (2-5 s) mimics a human clicking.
-            'sleep_interval': 2,
-            'max_sleep_interval': 5,
-
             # ── Reliability ───────────────────────────────────────────────
             # Instagram's CDN intermittently 403s; extra retries usually
             # succeed on a different edge server.
@@ -125,6 +161,12 @@ class VideoConverter:
             'geo_bypass': False,
         }
 
+        # ── Rate-limiting / stealth ────────────────────────────────────
+        # Request spacing is coordinated process-wide by the Instagram
+        # throttle.  yt-dlp's own sleep_requests / sleep_interval are only
+        # switched on while it is backing off after 403/429 responses.
+        overrides.update(get_instagram_throttle().yt_dlp_sleep_options())
+
         # Optional cookie file for authenticated downloads — lets the
         # deployer use a burner account for higher reliability without
         # code changes.
@@ -137,8 +179,8 @@ class VideoConverter:
 
     async def get_video_info(self, url: str) -> VideoInfo:
         """Fetch video metadata without downloading"""
-        # Normalize YouTube Shorts URLs
-        url = normalize_youtube_url(url)
+        # One URL per video: strips tracking params, unifies youtu.be/shorts/...
+        url = canonical_url(url)
 
         instagram = _is_instagram(url)
 
@@ -165,17 +207,29 @@ class VideoConverter:
             ydl_opts['remote_components'] = ['ejs:github']
             ydl_opts['extractor_args'] = {'youtube': ['player_client=web,android,ios,web_creator']}
 
+        tracer = get_tracer()
+        job_id = current_job.get()
+        submitted = time.perf_counter()
+
         def _fetch():
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                # Drop the huge 'formats' list immediately — we only need basic
-                # metadata fields and this dict can be 5–10 MB for long videos.
-                if info:
-                    info.pop('formats', None)
-                    info.pop('thumbnails', None)
-                    info.pop('automatic_captions', None)
-                    info.pop('subtitles', None)
-                return info
+            # Time spent waiting for a free worker thread
+            waited = tracer.begin(job_id, "info.executor_wait")
+            waited.start = submitted
+            waited.close()
+            with tracer.span("info.extract", job_id), _instagram_throttled(instagram):
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(url, download=False)
+            # Drop the huge 'formats' list immediately — we only need basic
+            # metadata fields and this dict can be 5–10 MB for long videos.
+            if info:
+                entries = info.pop('entries', None)
+                if entries is not None:
+                    info['entry_count'] = len(list(entries))
+                info.pop('formats', None)
+                info.pop('thumbnails', None)
+                info.pop('automatic_captions', None)
+                info.pop('subtitles', None)
+            return info
 
         try:
             loop = asyncio.get_running_loop()
@@ -186,7 +240,9 @@ class VideoConverter:
                 channel=info.get('uploader', 'Unknown'),
                 duration=int(info.get('duration', 0) or 0),
                 thumbnail=info.get('thumbnail', ''),
-                video_id=info.get('id', '')
+                video_id=info.get('id', ''),
+                entry_count=info.get('entry_count'),
+                extractor=info.get('extractor'),
             )
         except Exception as e:
             logger.error(f"Error fetching video info: {e}")
@@ -231,7 +287,9 @@ class VideoConverter:
             # (|, :, –, etc.) breaking ffmpeg's output file open call.
             # The user-visible filename is set separately in the download
             # route via Content-Disposition, so nothing changes for users.
-            'outtmpl': str(self.download_dir / f'{job_id}.%(ext)s'),
+            # Everything is written to the job's scratch directory; only the
+            # final file is moved into download_dir.
+            'outtmpl': str(self.scratch.path_for(job_id) / f'{job_id}.%(ext)s'),
 
             # ── Network / anti-403 ─────────────────────────────────────────
             'force_ipv4': True,
@@ -240,6 +298,9 @@ class VideoConverter:
             'fragment_retries': 10,
             'skip_unavailable_fragments': True,
             'socket_timeout': 30,
+            # Resume from existing .part files / fragments (yt-dlp's default,
+            # spelled out because job resumption after a restart relies on it).
+            'continuedl': True,
 
             # ── Metadata ───────────────────────────────────────────────────
             'add_metadata': True,
@@ -374,163 +435,363 @@ class VideoConverter:
         format_type: FormatType,
         website_url: str = "http://localhost:7654",
         prefetched_info: Optional["VideoInfo"] = None,
+        client_id: str = "anonymous",
+        resume_opts: Optional[dict] = None,
+        formats: Optional[List[FormatType]] = None,
     ):
         """Download and convert video asynchronously.
 
         Pass *prefetched_info* to skip a redundant yt-dlp metadata call when
-        the caller already validated the URL.
+        the caller already validated the URL.  *client_id* (IP or API key)
+        is the fair-share scheduling key.  *resume_opts* are the journaled
+        yt-dlp options of a job interrupted by a restart.  *formats* is the
+        full output set (led by *format_type*) of a multi-format job: one
+        source download feeds a single ffmpeg run with one output per format.
         """
+        # Per-job timing spans; current_job routes spans opened in shared
+        # helpers (get_video_info) to this job's trace.
+        tracer = get_tracer()
+        tracer.start_trace(job_id)
+        job_token = current_job.set(job_id)
+        multi = bool(formats) and len(formats) > 1
+        extra_formats = formats[1:] if multi else []
         try:
-            # Normalize YouTube Shorts URLs
-            url = normalize_youtube_url(url)
+            # One URL per video: strips tracking params, unifies youtu.be/shorts/...
+            url = canonical_url(url)
 
             # Re-use already-fetched info when available to avoid a second
             # network round-trip.
-            video_info = prefetched_info or await self.get_video_info(url)
-            jobs[job_id].video_title = video_info.title
-            jobs[job_id].format = format_type.value
-
-            # Update job status
-            jobs[job_id].status = "processing"
-            jobs[job_id].message = "Starting download..."
-            jobs[job_id].progress = 10
-
-            ydl_opts = self._get_format_options(
-                format_type, url, website_url,
-                duration=video_info.duration,
-                job_id=job_id,
+            with tracer.span("info", cached=prefetched_info is not None):
+                video_info = prefetched_info or await self.get_video_info(url)
+            jobs[job_id].update(video_title=video_info.title, format=format_type.value)
+            journal = get_journal()
+            journal.save_info(job_id, video_info)
+
+            # Repeat image requests for the same video are served straight
+            # from the converted-thumbnail cache — no download at all.
+            if is_image_format(format_type):
+                cached = get_thumbnail_cache().get(_thumbnail_key(url, video_info), format_type)
+                if cached:
+                    loop = asyncio.get_running_loop()
+                    with tracer.span("image.write", cache_hit=True):
+                        file_path = await loop.run_in_executor(
+                            get_image_executor(), write_image_artifact,
+                            cached, self.scratch.path_for(job_id), job_id,
+                        )
+                    await self._complete_job(job_id, file_path)
+                    return
+
+                # Fast path: fetch the thumbnail URL we already have and
+                # convert it in memory — no yt-dlp download, no ffmpeg.  Only
+                # for single-entry media: Instagram carousels carry one
+                # thumbnail per entry, which the full pipeline collects.
+                # Also falls back to it if the fetch fails.
+                if video_info.thumbnail and (video_info.entry_count or 1) == 1:
+                    try:
+                        file_path = await self._fetch_image(job_id, format_type, video_info, url)
+                        await self._complete_job(job_id, file_path)
+                        return
+                    except Exception as e:
+                        logger.warning(f"Fast thumbnail fetch failed for job {job_id}, using yt-dlp: {e}")
+
+            # Take over a speculative source download started by /api/info,
+            # if one matches — yt-dlp then skips straight to postprocessing.
+            if speculation_enabled() and not is_image_format(format_type) and not multi:
+                with tracer.span("speculation.claim") as span:
+                    span.attrs["claimed"] = await get_speculator().claim(url, format_type, job_id)
+
+            if resume_opts:
+                ydl_opts = dict(resume_opts)
+            else:
+                ydl_opts = self._get_format_options(
+                    source_format(formats) if multi else format_type, url, website_url,
+                    duration=video_info.duration,
+                    job_id=job_id,
+                )
+                if multi:
+                    # The single-format postprocessors are replaced by one
+                    # MultiOutputEncodePP run (added at download time).
+                    ydl_opts['postprocessors'] = []
+                    ydl_opts['writethumbnail'] = False
+                journal.save_options(job_id, ydl_opts)
+
+            watchdog = get_watchdog()
+            memory_governor = get_memory_governor()
+
+            # Postprocessors yt-dlp will run: ours plus the implicit merger
+            # for split video+audio downloads and the final MoveFiles step.
+            tracker = ProgressTracker(
+                jobs[job_id],
+                postprocessor_count=len(ydl_opts.get('postprocessors', [])) + 2 + multi,
             )
 
             # Progress hook — runs inside the worker thread, so only mutate
             # simple Python objects (no async calls here).
+            hook_spans = tracer.hooks(job_id)
+
             def progress_hook(d):
-                if d['status'] == 'downloading':
-                    try:
-                        percent_str = d.get('_percent_str', '0%')
-                        match = re.search(r'([0-9.]+)', percent_str)
-                        if match:
-                            clean_percent = match.group(1)
-                            jobs[job_id].progress = min(int(float(clean_percent) * 0.8), 80)
-                            jobs[job_id].message = f"Downloading... {clean_percent}%"
-                    except Exception as e:
-                        logger.warning(f"Error parsing progress hook: {e}")
-                elif d['status'] == 'finished':
-                    jobs[job_id].progress = 85
-                    jobs[job_id].message = "Processing..."
+                # Feeds the stall detector; raises if the watchdog has aborted
+                # this job so yt-dlp unwinds instead of hanging forever.
+                watchdog.on_progress(job_id, d)
+                memory_governor.sample(job_id)
+                tracker.on_download(d)
+                hook_spans.on_download(d)
 
             ydl_opts['progress_hooks'] = [progress_hook]
 
-            # Run the blocking download/ffmpeg work in the bounded thread pool
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(_executor, self._download_video, url, ydl_opts)
+            def postprocessor_hook(d):
+                # Pauses the watchdog deadline while ffmpeg runs
+                watchdog.on_postprocess(job_id, d)
+                tracker.on_postprocess(d)
+                hook_spans.on_postprocess(d)
+
+            ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
+
+            # Wait for a fair-share slot, then run the blocking download/ffmpeg
+            # work in the bounded thread pool under the watchdog.  A stalled
+            # attempt whose worker unwound is retried — yt-dlp resumes from
+            # the .part file it left behind.
+            jobs[job_id].update(stage="queued", message="Waiting in queue...")
+            cost = estimate_job_cost(video_info.duration, format_type, extra_formats)
+            queued = tracer.begin(job_id, "queue", cost=round(cost, 1))
+            async with get_scheduler().slot(job_id, client_id, cost):
+                queued.close()
+                jobs[job_id].update(
+                    status="processing",
+                    stage="extracting",
+                    message="Starting download...",
+                    progress=10,
+                )
+                journal.save_status(jobs[job_id])
+                memory_governor.job_started(job_id)
+
+                # Share of the cores for this job's ffmpeg runs, sized by how
+                # many jobs are running alongside it.
+                cpu_budget = get_cpu_budget()
+                allocation = cpu_budget.allocate(job_id)
+                cpu_budget.apply_to_options(allocation, ydl_opts)
+
+                extra_pps = []
+                if multi:
+                    extra_pps.append(MultiOutputEncodePP(
+                        job_id, formats, self.scratch.path_for(job_id),
+                        {
+                            'title': video_info.title,
+                            'artist': video_info.channel,
+                            'comment': website_url,
+                        },
+                        threads=allocation.threads,
+                    ))
+
+                def _run_download():
+                    with cpu_budget.applied(allocation):
+                        self._download_video(url, ydl_opts, extra_pps, job_id)
+
+                loop = asyncio.get_running_loop()
+                max_retries = int(os.getenv("WATCHDOG_MAX_RETRIES", "1"))
+                for attempt in range(max_retries + 1):
+                    watchdog.start(job_id, video_info.duration, format_type, extra_formats)
+                    try:
+                        with tracer.span("download", attempt=attempt):
+                            future = loop.run_in_executor(_executor, tracer.profiled(job_id, _run_download))
+                            await watchdog.supervise(job_id, future)
+                        break
+                    except DownloadStalled as e:
+                        if not e.worker_exited:
+                            # The worker (and any ffmpeg it runs) is still
+                            # going: keep the slot, CPU share and scratch dir
+                            # until it actually exits, so failing the job
+                            # never lets more work run than the limits allow.
+                            jobs[job_id].update(message="Download stalled, stopping...")
+                            result, = await asyncio.gather(future, return_exceptions=True)
+                            if not isinstance(result, BaseException):
+                                # It finished after all (e.g. a long encode
+                                # landing just after the grace period).
+                                logger.info(f"Job {job_id} finished after the watchdog gave up on it")
+                                break
+                            raise Exception(f"Download stalled: {e.reason}")
+                        if attempt >= max_retries:
+                            raise Exception(f"Download stalled: {e.reason}")
+                        logger.warning(f"Job {job_id} stalled ({e.reason}), retrying")
+                        jobs[job_id].update(message="Connection stalled, retrying...")
+                    finally:
+                        watchdog.finish(job_id)
 
             # Find the file yt-dlp wrote — it's named {job_id}.{ext}
-            if format_type in [FormatType.IMAGE_PNG, FormatType.IMAGE_JPG, FormatType.IMAGE_JPEG]:
-                # Find all files belonging to this job
-                job_files = [f for f in self.download_dir.iterdir() if f.is_file() and f.name.startswith(job_id) and f.suffix != '.zip']
-                if not job_files:
-                    raise Exception("Downloaded files not found")
-                
-                target_ext = '.png' if format_type == FormatType.IMAGE_PNG else '.jpeg' if format_type == FormatType.IMAGE_JPEG else '.jpg'
-                
-                # Convert any images to the requested format using PIL if they don't match
-                from PIL import Image
-                import io
-                
-                converted_files = []
-                for f in job_files:
-                    if f.suffix != target_ext:
-                        new_path = f.with_suffix(target_ext)
-                        try:
-                            img = Image.open(f)
-                            # Convert RGBA to RGB before saving as JPEG/JPG
-                            if target_ext in ['.jpg', '.jpeg'] and img.mode in ('RGBA', 'P'):
-                                img = img.convert('RGB')
-                            img.save(new_path, format="PNG" if target_ext == '.png' else "JPEG")
-                            f.unlink()
-                            converted_files.append(new_path)
-                        except Exception as convert_e:
-                            logger.error(f"Failed to convert image {f}: {convert_e}")
-                            converted_files.append(f)
-                    else:
-                        converted_files.append(f)
-                
-                job_files = converted_files
-                
-                if len(job_files) > 1:
-                    import zipfile
-                    zip_path = self.download_dir / f"{job_id}.zip"
-                    with zipfile.ZipFile(zip_path, 'w') as zipf:
-                        for i, f in enumerate(job_files):
-                            if f != zip_path:
-                                zipf.write(f, f"file_{i+1}{f.suffix}")
-                                f.unlink()
-                    file_path = zip_path
-                else:
-                    file_path = job_files[0]
+            if multi:
+                scratch_dir = self.scratch.path_for(job_id)
+                outputs = {f: scratch_dir / output_name(job_id, f) for f in formats}
+                missing = [f.value for f, path in outputs.items() if not path.exists()]
+                if missing:
+                    raise Exception(f"Encoded files not found: {', '.join(missing)}")
+                await self._complete_job(job_id, outputs[format_type], outputs)
+                return
+            if is_image_format(format_type):
+                with tracer.span("image.postprocess"):
+                    file_path = await self._postprocess_images(
+                        job_id, format_type, _thumbnail_key(url, video_info),
+                    )
             else:
                 expected_ext = '.mp3' if 'mp3' in format_type.value else '.mp4'
-                file_path = self._find_downloaded_file(job_id, expected_ext)
+                with tracer.span("find_file"):
+                    file_path = self._find_downloaded_file(job_id, expected_ext)
 
                 if not file_path:
                     raise Exception("Downloaded file not found")
 
-                # Clean up any leftover thumbnail files
-                self._cleanup_thumbnails(job_id)
-
-            # Update job with completion
-            jobs[job_id].status = "completed"
-            jobs[job_id].progress = 100
-            jobs[job_id].message = "Conversion complete!"
-            jobs[job_id].file_path = str(file_path)
-
-            logger.info(f"Job {job_id} completed successfully")
+            # Publishing removes the scratch directory, and with it any
+            # thumbnail EmbedThumbnail failed to clean up.
+            await self._complete_job(job_id, file_path)
 
         except Exception as e:
             logger.error(f"Job {job_id} failed: {e}")
-            jobs[job_id].status = "failed"
-            jobs[job_id].error = str(e)
+            jobs[job_id].update(status="failed", stage="failed", error=str(e))
+            get_journal().save_status(jobs[job_id])
+            # Not on cancellation: a job interrupted by shutdown keeps its
+            # scratch files so it can resume after the restart.
+            self.scratch.discard(job_id)
 
         finally:
-            # Always release memory after a job ends (success or failure).
-            # This returns the heap pages used by yt-dlp's info dicts and
-            # ffmpeg buffers back to the OS so the container RAM drops back
-            # to its idle baseline.
-            _release_memory()
-            logger.debug(f"Memory released after job {job_id}")
-
-    def _download_video(self, url: str, ydl_opts: dict):
-        """Synchronous download function — runs inside the thread pool."""
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-
-    def _cleanup_thumbnails(self, job_id: str):
-        """Delete any leftover thumbnail image files for this job.
-
-        yt-dlp should remove them via EmbedThumbnail, but if ffmpeg fails to
-        embed the .webp / .jpg file stays behind.
+            # Let the memory governor record the job's peak RSS and decide
+            # whether to reclaim heap pages (off the event loop) or recycle
+            # the worker threads — instead of a full gc + malloc_trim on the
+            # event loop after every single job.
+            if await get_memory_governor().job_finished(job_id):
+                _recycle_executor()
+            get_cpu_budget().release(job_id)
+            await tracer.finish(job_id)
+            current_job.reset(job_token)
+
+    async def _complete_job(
+        self, job_id: str, artifact: Path, outputs: Optional[Dict[FormatType, Path]] = None,
+    ):
+        """Publish a job's finished artifact and mark the job completed.
+
+        *outputs* are all artifacts of a multi-format job (including
+        *artifact*, the one served by default), published under their own
+        names.
+        """
+        def _publish():
+            published = None
+            if outputs:
+                published = {}
+                for f, path in outputs.items():
+                    target = self.scratch.publish(path, path.name)
+                    published[f.value] = str(target)
+                    if path == artifact:
+                        primary = target
+            else:
+                primary = self.scratch.publish(artifact, f"{job_id}{artifact.suffix}")
+            self.scratch.discard(job_id)
+            return primary, published
+
+        # A rename normally, but a full copy when scratch is on another device
+        loop = asyncio.get_running_loop()
+        with get_tracer().span("publish", job_id):
+            file_path, published = await loop.run_in_executor(None, _publish)
+
+        jobs[job_id].update(
+            status="completed",
+            stage="completed",
+            progress=100,
+            speed=None,
+            eta=None,
+            message="Conversion complete!",
+            file_path=str(file_path),
+            outputs=published,
+        )
+        get_journal().save_status(jobs[job_id])
+
+        logger.info(f"Job {job_id} completed successfully")
+
+    async def _fetch_image(self, job_id: str, format_type: FormatType, video_info: VideoInfo, url: str) -> Path:
+        """Build an image job's output straight from the thumbnail URL."""
+        jobs[job_id].update(
+            status="processing",
+            stage="downloading",
+            message="Fetching thumbnail...",
+            progress=10,
+        )
+
+        headers = None
+        if _is_instagram(url):
+            # Instagram's CDN rejects requests without a browser UA / referer.
+            headers = {
+                'User-Agent': random.choice(_CHROME_USER_AGENTS),
+                'Referer': 'https://www.instagram.com/',
+            }
+        tracer = get_tracer()
+        with tracer.span("image.fetch", job_id):
+            data = await fetch_thumbnail(video_info.thumbnail, headers)
+
+        loop = asyncio.get_running_loop()
+        pool = get_image_executor()
+        target_ext = IMAGE_EXTENSIONS[format_type]
+        with tracer.span("image.convert", job_id, bytes=len(data)):
+            parts = [(target_ext, await loop.run_in_executor(pool, convert_image_bytes, data, target_ext))]
+        get_thumbnail_cache().put(_thumbnail_key(url, video_info), format_type, parts)
+        with tracer.span("image.write", job_id):
+            return await loop.run_in_executor(
+                pool, write_image_artifact, parts, self.scratch.path_for(job_id), job_id,
+            )
+
+    async def _postprocess_images(self, job_id: str, format_type: FormatType, cache_key: CanonicalKey) -> Path:
+        """Convert the thumbnails yt-dlp wrote for *job_id* into the download.
+
+        Pillow decode/encode and the zip write run in the image worker pool,
+        one task per image, so image jobs never block the event loop.  The
+        converted images are cached per (canonical key, format).
         """
-        if not self.download_dir.exists():
-            return
-        for ext in ('.webp', '.jpg', '.jpeg', '.png'):
-            candidate = self.download_dir / f"{job_id}{ext}"
-            if candidate.exists():
-                try:
-                    candidate.unlink()
-                    logger.debug(f"Removed leftover thumbnail: {candidate.name}")
-                except Exception as e:
-                    logger.warning(f"Could not remove thumbnail {candidate}: {e}")
+        loop = asyncio.get_running_loop()
+        pool = get_image_executor()
+
+        scratch_dir = self.scratch.path_for(job_id)
+
+        def _list_job_files():
+            return sorted(
+                f for f in scratch_dir.iterdir()
+                if f.is_file() and f.suffix != '.zip'
+            )
+
+        job_files = await loop.run_in_executor(pool, _list_job_files)
+        if not job_files:
+            raise Exception("Downloaded files not found")
+
+        target_ext = IMAGE_EXTENSIONS[format_type]
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(pool, convert_image_file, f, target_ext)
+            for f in job_files
+        ))
+        parts = list(parts)
+        get_thumbnail_cache().put(cache_key, format_type, parts)
+        return await loop.run_in_executor(pool, write_image_artifact, parts, scratch_dir, job_id)
+
+    def _download_video(self, url: str, ydl_opts: dict, postprocessors: Sequence = (),
+                        job_id: Optional[str] = None):
+        """Synchronous download function — runs inside the thread pool.
+
+        *postprocessors* are PostProcessor instances (which can't go through
+        the journaled options) run after the ones in *ydl_opts*.  *job_id*
+        is the watched job, whose deadline excludes the throttle wait.
+        """
+        with _instagram_throttled(_is_instagram(url), job_id):
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                for pp in postprocessors:
+                    ydl.add_post_processor(pp, when='post_process')
+                ydl.download([url])
 
     def _find_downloaded_file(self, job_id: str, expected_ext: str) -> Optional[Path]:
         """Find the file yt-dlp wrote for this job (named {job_id}.{ext})."""
+        scratch_dir = self.scratch.path_for(job_id)
         # Direct match first
-        candidate = self.download_dir / f"{job_id}{expected_ext}"
+        candidate = scratch_dir / f"{job_id}{expected_ext}"
         if candidate.exists():
             logger.info(f"Found downloaded file: {candidate.name}")
             return candidate
 
-        # Fallback: scan directory in case extension differs slightly
-        for file in self.download_dir.iterdir():
+        # Fallback: scan the job's own scratch directory in case the
+        # extension differs slightly — only this job's files are in there.
+        for file in scratch_dir.iterdir():
             if file.is_file() and file.stem == job_id:
                 logger.info(f"Found downloaded file (fallback): {file.name}")
                 return file
@@ -538,32 +799,111 @@ class VideoConverter:
         logger.warning(f"No file found for job {job_id} with extension {expected_ext}")
         return None
 
-    def get_file_path(self, job_id: str) -> Optional[Path]:
-        """Get the file path for a completed job"""
+    def get_file_path(self, job_id: str, format_type: Optional[FormatType] = None) -> Optional[Path]:
+        """Get the file path for a completed job (or one output of a
+        multi-format job)"""
         job = jobs.get(job_id)
-        if job and job.status == "completed" and hasattr(job, 'file_path'):
-            return Path(job.file_path)
-        return None
+        if not job or job.status != "completed":
+            return None
+        if format_type is not None and format_type.value != job.format:
+            path = (job.outputs or {}).get(format_type.value)
+            return Path(path) if path else None
+        return Path(job.file_path) if job.file_path else None
 
 
 # Global converter instance
-converter = VideoConverter()
+converter = VideoConverter(os.getenv("DOWNLOAD_DIR", "./downloads"))
 
 
-def create_job(url: str, format_type: FormatType) -> str:
+def create_job(
+    url: str,
+    format_type: FormatType,
+    website_url: str = "http://localhost:7654",
+    client_id: str = "anonymous",
+    formats: Optional[List[FormatType]] = None,
+) -> str:
     """Create a new conversion job"""
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = JobStatus(
-        job_id=job_id,
-        status="pending",
-        progress=0,
-        message="Job created",
-        format=format_type.value,
-        created_at=datetime.utcnow().isoformat(),
+    # In cluster mode the id names this node, so /status and /download
+    # requests can be routed back here
+    cluster = get_cluster()
+    job_id = cluster.new_job_id() if cluster else str(uuid.uuid4())
+    jobs[job_id] = JobRecord(job_id, "pending", format_type.value, "Job created")
+    get_journal().record_job(
+        jobs[job_id], url, website_url, client_id,
+        [f.value for f in formats] if formats and len(formats) > 1 else None,
     )
     return job_id
 
 
+def resume_jobs(max_age_hours: float, max_attempts: int = 3) -> int:
+    """Reload the job journal after a restart and re-queue interrupted jobs.
+
+    Completed/failed jobs whose output still exists are restored so their
+    status and download links keep working.  Interrupted jobs are restarted
+    with their journaled options; yt-dlp continues from the .part files and
+    fragments they left behind.  Jobs older than *max_age_hours* or already
+    resumed *max_attempts* times (a crash loop) are failed instead.
+    Must be called from the running event loop.  Returns the number of jobs
+    re-queued.
+    """
+    journal = get_journal()
+    cutoff = time.time() - max_age_hours * 3600
+    resumed = 0
+    stale = []
+
+    for entry in journal.load():
+        job = entry.record
+        if job.is_terminal:
+            # Failed jobs have no file; keep them (and their error) for
+            # polling clients until they age out like any other record.
+            if job.status == "failed":
+                keep = job.created >= cutoff
+            else:
+                keep = bool(job.file_path) and Path(job.file_path).exists()
+            if keep:
+                jobs[entry.job_id] = job
+            else:
+                stale.append(entry.job_id)
+            continue
+
+        if job.created < cutoff or entry.attempts >= max_attempts:
+            job.update(status="failed", error="Job was interrupted by a server restart")
+            jobs[entry.job_id] = job
+            journal.save_status(job)
+            continue
+
+        job.update(status="pending", message="Resuming after restart...")
+        jobs[entry.job_id] = job
+        journal.mark_resumed(entry.job_id)
+        request = entry.request
+        asyncio.create_task(converter.convert_video(
+            entry.job_id,
+            request["url"],
+            FormatType(request["format"]),
+            request.get("website_url") or "http://localhost:7654",
+            prefetched_info=entry.info,
+            client_id=request.get("client_id") or "anonymous",
+            resume_opts=entry.ydl_opts,
+            formats=[FormatType(f) for f in request.get("formats") or []] or None,
+        ))
+        resumed += 1
+
+    journal.forget(stale)
+    if resumed:
+        logger.info(f"Resumed {resumed} interrupted job(s) from the journal")
+    return resumed
+
+
 def get_job_status(job_id: str) -> Optional[JobStatus]:
-    """Get the status of a job"""
-    return jobs.get(job_id)
+    """Get the status of a job, as served by the API"""
+    job = jobs.get(job_id)
+    if job is None:
+        return None
+    if job.status == "pending":
+        # Queue position / wait estimate are live scheduler state, filled in
+        # at serving time rather than stored on the record.
+        scheduler = get_scheduler()
+        position = scheduler.position(job_id)
+        if position is not None:
+            return job.to_model(position, scheduler.estimated_wait(job_id))
+    return job.to_model()
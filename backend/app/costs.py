@@ -0,0 +1,54 @@
+from typing import Iterable
+
+from .models import FormatType
+
+# ── Relative cost of one second of source media, per output format ────────────
+# Audio jobs only pull the (small) audio stream and run one cheap transcode.
+# Video jobs pull progressively larger video streams and pay for the ffmpeg
+# merge, so the weight grows with the target height.  Image jobs never
+# download the media itself, so their cost is essentially flat.
+FORMAT_WEIGHTS: dict[FormatType, float] = {
+    FormatType.MP3: 0.5,
+    FormatType.MP3_48: 0.4,
+    FormatType.MP3_64: 0.4,
+    FormatType.MP3_128: 0.5,
+    FormatType.MP3_240: 0.6,
+    FormatType.MP3_320: 0.6,
+    FormatType.MP4_360: 0.75,
+    FormatType.MP4_720: 1.0,
+    FormatType.MP4_1080: 1.5,
+    FormatType.MP4_1440: 2.5,
+    FormatType.MP4_2160: 4.0,
+    FormatType.IMAGE_PNG: 0.0,
+    FormatType.IMAGE_JPG: 0.0,
+    FormatType.IMAGE_JPEG: 0.0,
+}
+
+# Fixed per-job overhead (extraction, JS challenge, ffmpeg start-up) expressed
+# in the same units as duration × weight.  Keeps zero-length and image jobs
+# from being treated as free.
+BASE_JOB_COST = 10.0
+
+
+def format_weight(format_type: FormatType) -> float:
+    """Return the per-second cost weight for *format_type*."""
+    return FORMAT_WEIGHTS.get(format_type, 1.0)
+
+
+def combined_weight(formats: Iterable[FormatType]) -> float:
+    """Per-second weight of a job producing several formats from one source.
+
+    The heaviest format pays for the download; every further output only
+    adds an encode of the already-decoded source, counted at half weight.
+    """
+    weights = sorted((format_weight(f) for f in formats), reverse=True)
+    return weights[0] + 0.5 * sum(weights[1:]) if weights else 1.0
+
+
+def estimate_job_cost(
+    duration: float,
+    format_type: FormatType,
+    extra_formats: Iterable[FormatType] = (),
+) -> float:
+    """Estimate the relative cost of a job from its duration and format(s)."""
+    return BASE_JOB_COST + max(duration or 0, 0) * combined_weight([format_type, *extra_formats])
@@ -0,0 +1,192 @@
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from . import sysstats
+from .scheduler import FairScheduler, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class CpuAllocation:
+    """The CPU share handed to one job for its ffmpeg work."""
+
+    __slots__ = ("job_id", "threads", "cores", "nice")
+
+    def __init__(self, job_id: str, threads: int, cores: Optional[List[int]], nice: int):
+        self.job_id = job_id
+        self.threads = threads
+        self.cores = cores
+        self.nice = nice
+
+    def as_dict(self) -> dict:
+        return {"threads": self.threads, "cores": self.cores, "nice": self.nice}
+
+
+class CpuBudget:
+    """Splits the host's cores between concurrently running jobs.
+
+    ffmpeg picks its own thread count (usually one per core) for every
+    postprocessor it runs, so two concurrent transcodes plus the API process
+    oversubscribe the CPU, while a job running alone could use more cores
+    than it gets by default.  Each job instead gets an explicit ``-threads``
+    value for its ffmpeg decode and encode steps, sized so that all jobs
+    expected to run at once share ``cores - reserved_cores`` cores.  The
+    reserved cores stay free for the event loop and metadata lookups.
+
+    The threads handed out in total stay below ``cpu_target`` of the cores
+    (the concurrency controller's CPU high-water mark), so jobs running
+    exactly as budgeted don't read as overload to the controller and get
+    the slot count halved.
+
+    Optionally (``pin_cores``) each job's worker thread — and so the ffmpeg
+    processes it spawns — is pinned to its own set of cores outside the
+    reserved ones, and (``nice``) runs at a lower scheduling priority.
+    """
+
+    def __init__(
+        self,
+        scheduler: FairScheduler,
+        reserved_cores: int = 1,
+        min_threads: int = 1,
+        max_threads: int = 0,
+        pin_cores: bool = False,
+        nice: int = 0,
+        cpu_target: float = 0.85,
+    ):
+        self.scheduler = scheduler
+        self.cores = sysstats.effective_cpu_count()
+        self.reserved_cores = reserved_cores
+        self.cpu_target = cpu_target
+        self.min_threads = max(min_threads, 1)
+        self.max_threads = max_threads
+        self.pin_cores = pin_cores
+        self.nice = nice
+        self._active: Dict[str, CpuAllocation] = {}
+        self._core_use: Counter = Counter()
+        # Cores jobs may be pinned to: the affinity mask minus the reserved ones
+        affinity = sysstats.cpu_affinity()
+        self._pinnable = affinity[reserved_cores:] if affinity and len(affinity) > reserved_cores else affinity
+        if pin_cores and not self._pinnable:
+            logger.warning("CPU pinning requested but not supported on this platform")
+            self.pin_cores = False
+
+    @property
+    def usable_cores(self) -> int:
+        headroom = int(self.cores * self.cpu_target)
+        return max(min(self.cores - self.reserved_cores, headroom), 1)
+
+    def allocate(self, job_id: str) -> CpuAllocation:
+        """Size the CPU share of a job that just got a scheduler slot.
+
+        Counts every job expected to run alongside it: those already
+        running plus, when there is a backlog, enough queued ones to fill
+        every slot.  ffmpeg can't change its thread count mid-run, so
+        assuming a full house while jobs are waiting avoids handing the
+        first job every core just before the next one starts.
+        """
+        stats = self.scheduler.stats()
+        running = len(self._active) + 1
+        sharers = max(running, min(stats["capacity"], running + stats["queued"]))
+
+        threads = max(self.usable_cores // sharers, self.min_threads)
+        if self.max_threads:
+            threads = min(threads, self.max_threads)
+
+        cores = None
+        if self.pin_cores:
+            # Least-used cores first, so concurrent jobs land on disjoint sets
+            # whenever there are enough of them.
+            ranked = sorted(self._pinnable, key=lambda c: (self._core_use[c], c))
+            cores = sorted(ranked[:min(threads, len(ranked))])
+            self._core_use.update(cores)
+
+        allocation = CpuAllocation(job_id, threads, cores, self.nice)
+        self._active[job_id] = allocation
+        return allocation
+
+    def release(self, job_id: str):
+        allocation = self._active.pop(job_id, None)
+        if allocation and allocation.cores:
+            self._core_use.subtract(allocation.cores)
+
+    @staticmethod
+    def apply_to_options(allocation: CpuAllocation, ydl_opts: dict):
+        """Set ``-threads`` for every ffmpeg the job's postprocessors run,
+        on both the input (decode) and output (encode) side."""
+        pp_args = dict(ydl_opts.get('postprocessor_args') or {})
+        for key in ('ffmpeg', 'ffmpeg_i'):
+            args = list(pp_args.get(key) or [])
+            # Drop a previous allocation (resumed jobs carry their old options)
+            while '-threads' in args:
+                i = args.index('-threads')
+                del args[i:i + 2]
+            pp_args[key] = ['-threads', str(allocation.threads), *args]
+        ydl_opts['postprocessor_args'] = pp_args
+
+    @contextmanager
+    def applied(self, allocation: CpuAllocation):
+        """Pin and renice the calling worker thread for the body.
+
+        Runs in the worker thread; on Linux affinity and niceness are per
+        thread and inherited by the ffmpeg processes it spawns.  Affinity is
+        restored afterwards.  Niceness can't be lowered again without
+        CAP_SYS_NICE, so a reniced worker stays at that priority — all jobs
+        use the same value, so that only affects metadata lookups which
+        happen to land on the same thread.
+        """
+        previous = None
+        if allocation.cores:
+            try:
+                previous = os.sched_getaffinity(0)
+                os.sched_setaffinity(0, allocation.cores)
+            except OSError as e:
+                logger.debug(f"Could not pin job {allocation.job_id}: {e}")
+                previous = None
+        if allocation.nice:
+            try:
+                current = os.getpriority(os.PRIO_PROCESS, 0)
+                if current < allocation.nice:
+                    os.setpriority(os.PRIO_PROCESS, 0, allocation.nice)
+            except OSError as e:
+                logger.debug(f"Could not renice job {allocation.job_id}: {e}")
+        try:
+            yield
+        finally:
+            if previous is not None:
+                try:
+                    os.sched_setaffinity(0, previous)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "cores": self.cores,
+            "reserved_cores": self.reserved_cores,
+            "usable_cores": self.usable_cores,
+            "pin_cores": self.pin_cores,
+            "nice": self.nice,
+            "active": {job_id: a.as_dict() for job_id, a in self._active.items()},
+        }
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_budget: CpuBudget | None = None
+
+
+def get_cpu_budget() -> CpuBudget:
+    """Return (or create) the global CPU budget."""
+    global _budget
+    if _budget is None:
+        _budget = CpuBudget(
+            get_scheduler(),
+            reserved_cores=int(os.getenv("CPU_RESERVED_CORES", "1")),
+            min_threads=int(os.getenv("FFMPEG_MIN_THREADS", "1")),
+            max_threads=int(os.getenv("FFMPEG_MAX_THREADS", "0")),
+            pin_cores=os.getenv("CPU_PIN_JOBS", "false").lower() in ("1", "true", "yes"),
+            nice=int(os.getenv("JOB_NICE", "0")),
+            cpu_target=float(os.getenv("CONCURRENCY_CPU_HIGH", "0.85")),
+        )
+    return _budget
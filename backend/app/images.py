@@ -0,0 +1,205 @@
+import io
+import logging
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .canonical import CanonicalKey
+from .models import FormatType
+from .sysstats import effective_cpu_count
+
+logger = logging.getLogger(__name__)
+
+# Output extension per image FormatType
+IMAGE_EXTENSIONS = {
+    FormatType.IMAGE_PNG: '.png',
+    FormatType.IMAGE_JPG: '.jpg',
+    FormatType.IMAGE_JPEG: '.jpeg',
+}
+
+# One image inside a result: (file extension, encoded bytes)
+ImagePart = Tuple[str, bytes]
+
+
+def is_image_format(format_type: FormatType) -> bool:
+    return format_type in IMAGE_EXTENSIONS
+
+
+def convert_image_bytes(data: bytes, target_ext: str) -> bytes:
+    """Re-encode an image held in memory as PNG or JPEG.
+
+    Returns *data* untouched when it is already in the target format.
+    """
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    if img.format == ("PNG" if target_ext == '.png' else "JPEG"):
+        return data
+    # Convert RGBA to RGB before saving as JPEG/JPG
+    if target_ext in ('.jpg', '.jpeg') and img.mode in ('RGBA', 'P', 'LA'):
+        img = img.convert('RGB')
+    out = io.BytesIO()
+    img.save(out, format="PNG" if target_ext == '.png' else "JPEG")
+    return out.getvalue()
+
+
+def convert_image_file(path: Path, target_ext: str) -> ImagePart:
+    """Read one downloaded thumbnail, convert it if needed and delete it.
+
+    Runs in the image worker pool.  If Pillow can't decode the file the
+    original bytes are kept, so the user still gets *something*.
+    """
+    data = path.read_bytes()
+    part: ImagePart = (path.suffix, data)
+    if path.suffix != target_ext:
+        try:
+            part = (target_ext, convert_image_bytes(data, target_ext))
+        except Exception as e:
+            logger.error(f"Failed to convert image {path}: {e}")
+    path.unlink()
+    return part
+
+
+def write_image_artifact(parts: List[ImagePart], dest_dir: Path, job_id: str) -> Path:
+    """Write the final download: the image itself, or a zip for several."""
+    if len(parts) == 1:
+        ext, data = parts[0]
+        file_path = dest_dir / f"{job_id}{ext}"
+        file_path.write_bytes(data)
+        return file_path
+
+    zip_path = dest_dir / f"{job_id}.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zipf:
+        for i, (ext, data) in enumerate(parts):
+            zipf.writestr(f"file_{i+1}{ext}", data)
+    return zip_path
+
+
+class ThumbnailCache:
+    """Thread-safe LRU of converted thumbnails keyed by (canonical key, format).
+
+    The key includes the extractor: ids are only unique within a site, and
+    the generic extractor derives them from the URL path.
+
+    Thumbnails are small (tens to hundreds of KB), so a few hundred entries
+    cost a few tens of MB while turning repeat image requests for popular
+    videos into a plain file write.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[CanonicalKey, str], List[ImagePart]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(parts: List[ImagePart]) -> int:
+        return sum(len(data) for _, data in parts)
+
+    def get(self, key: CanonicalKey, format_type: FormatType) -> Optional[List[ImagePart]]:
+        if not key.video_id:
+            return None
+        with self._lock:
+            parts = self._entries.get((key, format_type.value))
+            if parts is not None:
+                self._entries.move_to_end((key, format_type.value))
+            return parts
+
+    def put(self, key: CanonicalKey, format_type: FormatType, parts: List[ImagePart]):
+        if not key.video_id or not parts or self.max_entries <= 0:
+            return
+        size = self._size(parts)
+        if size > self.max_bytes:
+            return
+        entry = (key, format_type.value)
+        with self._lock:
+            old = self._entries.pop(entry, None)
+            if old is not None:
+                self._bytes -= self._size(old)
+            self._entries[entry] = parts
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+
+# Thumbnails are a few hundred KB; anything far bigger is not a thumbnail.
+MAX_THUMBNAIL_BYTES = 20 * 1024 * 1024
+
+
+async def fetch_thumbnail(url: str, headers: Optional[Dict[str, str]] = None) -> bytes:
+    """Download a thumbnail through the shared HTTP client."""
+    client = get_http_client()
+    async with client.stream("GET", url, headers=headers) as response:
+        response.raise_for_status()
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_THUMBNAIL_BYTES:
+                raise ValueError(f"Thumbnail larger than {MAX_THUMBNAIL_BYTES} bytes")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+# ── Singletons ─────────────────────────────────────────────────────────────────
+_image_executor: ThreadPoolExecutor | None = None
+_thumbnail_cache: ThumbnailCache | None = None
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Pooled async HTTP client for thumbnail fetches.
+
+    Keeps connections to the image CDNs (i.ytimg.com, Instagram's CDN) alive
+    between jobs, so a fetch is usually a single round-trip.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client (called at shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_image_executor() -> ThreadPoolExecutor:
+    """Pool for Pillow decode/encode and zip writes.
+
+    Pillow releases the GIL while decoding and encoding, so threads convert
+    images in parallel without touching the event loop or a download slot.
+    """
+    global _image_executor
+    if _image_executor is None:
+        workers = int(os.getenv("IMAGE_WORKERS", str(min(4, effective_cpu_count()))))
+        _image_executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="image")
+    return _image_executor
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return (or create) the global converted-thumbnail cache."""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        _thumbnail_cache = ThumbnailCache(
+            max_entries=int(os.getenv("THUMBNAIL_CACHE_ENTRIES", "256")),
+            max_bytes=int(os.getenv("THUMBNAIL_CACHE_MB", "64")) * 1024 * 1024,
+        )
+    return _thumbnail_cache
@@ -0,0 +1,144 @@
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from .models import JobStatus
+
+# Small-integer status codes; the API still speaks the string names.
+PENDING, PROCESSING, COMPLETED, FAILED = range(4)
+STATUS_NAMES = ("pending", "processing", "completed", "failed")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# Fields holding one of a handful of repeated strings (format values, stage
+# names) — interned so every record shares the same string objects.
+_INTERNED = frozenset({"format", "stage"})
+
+# One lock for all records: updates are a few attribute stores, so
+# contention is negligible and records don't each carry a lock object.
+_lock = threading.Lock()
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class JobRecord:
+    """Compact in-memory state of one conversion job.
+
+    The ``jobs`` table can hold tens of thousands of entries (records live
+    for up to twice FILE_RETENTION_HOURS), and the progress hook rewrites
+    them from worker threads.  A slotted object with an integer status code
+    and interned strings is a fraction of the size of a Pydantic model and
+    far cheaper to update; the JobStatus model is only built when a status
+    is served (see ``to_model``).
+
+    Multi-field changes go through ``update`` so a concurrent ``to_model``
+    never observes half of an update.
+    """
+
+    __slots__ = (
+        "job_id", "code", "progress", "message", "error", "file_path",
+        "video_title", "format", "created", "stage",
+        "downloaded_bytes", "total_bytes", "speed", "eta", "outputs",
+    )
+
+    def __init__(self, job_id: str, status: str = "pending", format: Optional[str] = None,
+                 message: Optional[str] = None, created: Optional[float] = None):
+        self.job_id = job_id
+        self.code = _STATUS_CODES[status]
+        self.progress = 0
+        self.message = message
+        self.error: Optional[str] = None
+        self.file_path: Optional[str] = None
+        self.video_title: Optional[str] = None
+        self.format = _intern(format)
+        self.created = created if created is not None else time.time()  # Unix timestamp
+        self.stage: Optional[str] = None
+        self.downloaded_bytes: Optional[int] = None
+        self.total_bytes: Optional[int] = None
+        self.speed: Optional[float] = None
+        self.eta: Optional[int] = None
+        self.outputs: Optional[Dict[str, str]] = None
+
+    @property
+    def status(self) -> str:
+        return STATUS_NAMES[self.code]
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.code in (COMPLETED, FAILED)
+
+    def update(self, **fields):
+        """Atomically set several fields.  ``status`` takes the string name.
+
+        Entering a terminal status clears the transfer rate and ETA, and a
+        completed job's byte counts are settled to the final size.
+        """
+        with _lock:
+            status = fields.get("status")
+            if status in ("completed", "failed"):
+                self.speed = None
+                self.eta = None
+                if status == "completed" and (self.total_bytes or self.downloaded_bytes):
+                    final = max(self.total_bytes or 0, self.downloaded_bytes or 0)
+                    self.downloaded_bytes = self.total_bytes = final
+            for name, value in fields.items():
+                if name == "status":
+                    self.code = _STATUS_CODES[value]
+                elif name in _INTERNED:
+                    setattr(self, name, _intern(value))
+                else:
+                    setattr(self, name, value)
+
+    def to_model(self, queue_position: Optional[int] = None,
+                 estimated_wait: Optional[float] = None) -> JobStatus:
+        """Build the API representation of the job."""
+        with _lock:
+            return JobStatus.model_construct(
+                job_id=self.job_id,
+                status=STATUS_NAMES[self.code],
+                progress=self.progress,
+                message=self.message,
+                error=self.error,
+                file_path=self.file_path,
+                video_title=self.video_title,
+                format=self.format,
+                created_at=datetime.fromtimestamp(self.created, timezone.utc)
+                .replace(tzinfo=None).isoformat(),
+                stage=self.stage,
+                downloaded_bytes=self.downloaded_bytes,
+                total_bytes=self.total_bytes,
+                speed=self.speed,
+                eta=self.eta,
+                outputs=self.outputs,
+                queue_position=queue_position,
+                estimated_wait=estimated_wait,
+            )
+
+    @classmethod
+    def from_model(cls, model: JobStatus) -> "JobRecord":
+        """Rebuild a record from its JobStatus form (e.g. from the journal)."""
+        created = None
+        if model.created_at:
+            try:
+                created = (
+                    datetime.fromisoformat(model.created_at)
+                    .replace(tzinfo=timezone.utc)
+                    .timestamp()
+                )
+            except ValueError:
+                pass
+        record = cls(model.job_id, model.status, model.format, model.message, created)
+        record.progress = model.progress
+        record.error = model.error
+        record.file_path = model.file_path
+        record.video_title = model.video_title
+        record.stage = _intern(model.stage)
+        record.outputs = model.outputs
+        record.downloaded_bytes = model.downloaded_bytes
+        record.total_bytes = model.total_bytes
+        record.speed = model.speed
+        record.eta = model.eta
+        return record
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .jobs import JobRecord
+from .models import JobStatus, VideoInfo
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    request    TEXT NOT NULL,   -- {"url", "format", "website_url", "client_id" (IP or API key digest)}
+    info       TEXT,            -- VideoInfo JSON once metadata is resolved
+    ydl_opts   TEXT,            -- JSON-serialisable yt-dlp options in use
+    record     TEXT NOT NULL,   -- last journaled JobStatus JSON
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+# yt-dlp options holding callables — re-attached by the job on resume.
+_RUNTIME_OPTS = ("progress_hooks", "postprocessor_hooks")
+
+
+class JournalEntry:
+    """One journaled job, as loaded at startup."""
+
+    __slots__ = ("job_id", "status", "request", "info", "ydl_opts", "record", "attempts")
+
+    def __init__(self, row: sqlite3.Row):
+        self.job_id: str = row["job_id"]
+        self.status: str = row["status"]
+        self.request: dict = json.loads(row["request"])
+        self.info: Optional[VideoInfo] = (
+            VideoInfo.model_validate_json(row["info"]) if row["info"] else None
+        )
+        self.ydl_opts: Optional[dict] = json.loads(row["ydl_opts"]) if row["ydl_opts"] else None
+        self.record: JobRecord = JobRecord.from_model(JobStatus.model_validate_json(row["record"]))
+        self.attempts: int = row["attempts"]
+
+
+class JobJournal:
+    """Durable record of job state, backed by SQLite.
+
+    The in-memory ``jobs`` dict is still the source of truth while the
+    process runs; the journal is written on state transitions (not on every
+    progress tick) so that after a restart interrupted jobs can be re-queued
+    with the same request, metadata and yt-dlp options.  Because the output
+    template is keyed on the job id, yt-dlp then continues from the .part
+    files and completed fragments already on disk instead of refetching.
+
+    WAL mode with synchronous=NORMAL keeps each write well under a
+    millisecond, so it is fine to call from the event loop.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+
+    def _execute(self, sql: str, params: Iterable = ()):
+        with self._lock:
+            try:
+                return self._conn.execute(sql, tuple(params))
+            except sqlite3.Error as e:
+                # Losing a journal write only costs resumability — never
+                # fail the job over it.
+                logger.error(f"Job journal write failed: {e}")
+                return None
+
+    def record_job(self, job: JobRecord, url: str, website_url: str, client_id: str,
+                   formats: Optional[List[str]] = None):
+        """Journal a newly created job (*formats*: full set of a multi-format job)."""
+        request = {
+            "url": url,
+            "format": job.format,
+            "website_url": website_url,
+            "client_id": client_id,
+        }
+        if formats:
+            request["formats"] = formats
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, request, record, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job.job_id, job.status, json.dumps(request), job.to_model().model_dump_json(), time.time()),
+        )
+
+    def save_status(self, job: JobRecord):
+        """Journal a job's current status (call on state transitions)."""
+        self._execute(
+            "UPDATE jobs SET status = ?, record = ?, updated_at = ? WHERE job_id = ?",
+            (job.status, job.to_model().model_dump_json(), time.time(), job.job_id),
+        )
+
+    def save_info(self, job_id: str, info: VideoInfo):
+        self._execute(
+            "UPDATE jobs SET info = ?, updated_at = ? WHERE job_id = ?",
+            (info.model_dump_json(), time.time(), job_id),
+        )
+
+    def save_options(self, job_id: str, ydl_opts: dict):
+        """Journal the yt-dlp options so a resumed job uses identical ones
+        (same output template, same randomly picked User-Agent, ...)."""
+        serialisable = {}
+        for key, value in ydl_opts.items():
+            if key in _RUNTIME_OPTS:
+                continue
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            serialisable[key] = value
+        self._execute(
+            "UPDATE jobs SET ydl_opts = ?, updated_at = ? WHERE job_id = ?",
+            (json.dumps(serialisable), time.time(), job_id),
+        )
+
+    def mark_resumed(self, job_id: str):
+        self._execute("UPDATE jobs SET attempts = attempts + 1 WHERE job_id = ?", (job_id,))
+
+    def forget(self, job_ids: Iterable[str]):
+        """Drop journal rows for jobs evicted from memory."""
+        for job_id in job_ids:
+            self._execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def load(self) -> List[JournalEntry]:
+        """Return every journaled job, oldest first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY updated_at").fetchall()
+        entries = []
+        for row in rows:
+            try:
+                entries.append(JournalEntry(row))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable journal entry {row['job_id']}: {e}")
+        return entries
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_journal: JobJournal | None = None
+
+
+def get_journal() -> JobJournal:
+    """Return (or create) the global job journal.
+
+    Lives in a subdirectory of DOWNLOAD_DIR by default, so it shares the
+    persistent volume with the partial downloads it resumes; the cleanup
+    service only sweeps top-level files.
+    """
+    global _journal
+    if _journal is None:
+        default = Path(os.getenv("DOWNLOAD_DIR", "./downloads")) / ".state" / "jobs.sqlite3"
+        _journal = JobJournal(Path(os.getenv("JOB_JOURNAL_PATH", str(default))))
+    return _journal
@@ -0,0 +1,176 @@
+import asyncio
+import ctypes
+import gc
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from .sysstats import process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def release_memory():
+    """Force Python to release unused heap memory back to the OS.
+
+    Python's allocator (pymalloc) keeps freed objects in an internal pool
+    and never returns them to the OS on its own.  After a large job:
+      1. gc.collect() — frees any reference-cycle garbage
+      2. malloc_trim(0) — tells glibc to return the now-empty pages to the OS
+    This is Linux-only (no-op on other platforms) and safe to call anytime.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except Exception:
+        pass  # Non-Linux (Windows/macOS dev machines) — silently skip
+
+
+class MemoryGovernor:
+    """Decides when to reclaim memory and when to recycle the worker pool.
+
+    A full gc.collect() + malloc_trim() after every job stalls every API
+    request while it runs, so the governor tracks RSS per job (baseline at
+    start, peak sampled from the progress hook) and only reclaims when:
+
+      - RSS has grown by ``trim_growth_bytes`` since the last reclaim, or
+      - RSS is above ``trim_threshold_bytes`` and the last reclaim was more
+        than ``min_trim_interval`` seconds ago.
+
+    Reclaiming runs on its own single thread, off the event loop.  (A full
+    collection still holds the GIL while it runs, which is why it is no
+    longer done after every job.)
+
+    job_finished() also reports when the download worker threads should be
+    recycled — after ``recycle_after_jobs`` jobs or ``recycle_growth_bytes``
+    of RSS growth since the pool was created — so per-thread state held by
+    long-lived workers (thread-locals, references kept alive by their
+    frames) is dropped periodically.  Exiting threads don't hand glibc
+    arena memory back to the OS by themselves; that only happens through
+    the malloc_trim in the regular reclaim above.
+    """
+
+    def __init__(
+        self,
+        trim_threshold_bytes: int = 512 * _MB,
+        trim_growth_bytes: int = 128 * _MB,
+        min_trim_interval: float = 60,
+        recycle_after_jobs: int = 50,
+        recycle_growth_bytes: int = 256 * _MB,
+        sample_interval: float = 1.0,
+    ):
+        self.trim_threshold_bytes = trim_threshold_bytes
+        self.trim_growth_bytes = trim_growth_bytes
+        self.min_trim_interval = min_trim_interval
+        self.recycle_after_jobs = recycle_after_jobs
+        self.recycle_growth_bytes = recycle_growth_bytes
+        self.sample_interval = sample_interval
+
+        baseline = process_rss_bytes() or 0
+        self._rss_after_trim = baseline
+        self._rss_at_recycle = baseline
+        self._last_trim_at = 0.0
+        self._jobs_since_recycle = 0
+        # job_id -> [baseline_rss, peak_rss, last_sample_monotonic]
+        self._active: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.recent_jobs: deque = deque(maxlen=100)
+        # Dedicated thread so a reclaim never occupies a download slot.
+        self._reclaim_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mem-reclaim")
+
+    def job_started(self, job_id: str):
+        """Record the RSS baseline for a job."""
+        rss = process_rss_bytes() or 0
+        with self._lock:
+            self._active[job_id] = [rss, rss, time.monotonic()]
+
+    def sample(self, job_id: str):
+        """Update a job's peak RSS.  Cheap enough for the progress hook:
+        reads /proc at most once per ``sample_interval`` per job."""
+        entry = self._active.get(job_id)
+        if entry is None:
+            return
+        now = time.monotonic()
+        if now - entry[2] < self.sample_interval:
+            return
+        entry[2] = now
+        rss = process_rss_bytes()
+        if rss and rss > entry[1]:
+            entry[1] = rss
+
+    async def job_finished(self, job_id: str) -> bool:
+        """Record the job's peak RSS, reclaim if a threshold is crossed.
+
+        Returns True when the caller should recycle its worker pool.
+        """
+        self.sample(job_id)
+        with self._lock:
+            entry = self._active.pop(job_id, None)
+        rss = process_rss_bytes() or 0
+        if entry:
+            baseline, peak, _ = entry
+            peak = max(peak, rss)
+            self.recent_jobs.append({"job_id": job_id, "baseline_rss": baseline, "peak_rss": peak})
+            logger.debug(
+                f"Job {job_id} RSS: baseline {baseline // _MB} MB, peak {peak // _MB} MB, "
+                f"now {rss // _MB} MB"
+            )
+
+        now = time.monotonic()
+        if rss and (
+            rss - self._rss_after_trim >= self.trim_growth_bytes
+            or (rss >= self.trim_threshold_bytes and now - self._last_trim_at >= self.min_trim_interval)
+        ):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._reclaim_executor, release_memory)
+            self._last_trim_at = now
+            after = process_rss_bytes() or rss
+            logger.info(f"Memory reclaimed: {rss // _MB} MB -> {after // _MB} MB")
+            self._rss_after_trim = after
+            rss = after
+
+        self._jobs_since_recycle += 1
+        if (
+            self._jobs_since_recycle >= self.recycle_after_jobs
+            or (rss and rss - self._rss_at_recycle >= self.recycle_growth_bytes)
+        ):
+            logger.info(
+                f"Recycling worker pool after {self._jobs_since_recycle} job(s), "
+                f"RSS {rss // _MB} MB"
+            )
+            self._jobs_since_recycle = 0
+            self._rss_at_recycle = rss
+            return True
+        return False
+
+    def stats(self) -> dict:
+        """Snapshot of the governor's state, for logs and debugging."""
+        return {
+            "rss_bytes": process_rss_bytes(),
+            "rss_after_last_trim": self._rss_after_trim,
+            "jobs_since_recycle": self._jobs_since_recycle,
+            "recent_jobs": list(self.recent_jobs)[-10:],
+        }
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_memory_governor: MemoryGovernor | None = None
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Return (or create) the global memory governor."""
+    global _memory_governor
+    if _memory_governor is None:
+        _memory_governor = MemoryGovernor(
+            trim_threshold_bytes=int(os.getenv("MEMORY_TRIM_THRESHOLD_MB", "512")) * _MB,
+            trim_growth_bytes=int(os.getenv("MEMORY_TRIM_GROWTH_MB", "128")) * _MB,
+            recycle_after_jobs=int(os.getenv("WORKER_RECYCLE_AFTER_JOBS", "50")),
+            recycle_growth_bytes=int(os.getenv("WORKER_RECYCLE_GROWTH_MB", "256")) * _MB,
+        )
+    return _memory_governor
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 
@@ -25,6 +25,9 @@ class ConvertRequest(BaseModel):
     """Request model for video conversion"""
     url: str = Field(..., description="YouTube video URL")
     format: FormatType = Field(..., description="Output format")
+    formats: Optional[List[FormatType]] = Field(
+        None, description="Additional output formats produced from the same download"
+    )
 
     class Config:
         json_schema_extra = {
@@ -42,6 +45,8 @@ class VideoInfo(BaseModel):
     duration: float  # in seconds
     thumbnail: str
     video_id: str
+    entry_count: Optional[int] = None  # Items in a multi-entry post (e.g. Instagram carousel)
+    extractor: Optional[str] = None  # yt-dlp extractor name, e.g. "youtube" or "generic"
 
 
 class JobStatus(BaseModel):
@@ -55,6 +60,14 @@ class JobStatus(BaseModel):
     video_title: Optional[str] = None  # Video title for better filename
     format: Optional[str] = None  # Requested format (mp3, mp4-360, etc.)
     created_at: Optional[str] = None  # ISO timestamp — used by cleanup to evict stale records
+    stage: Optional[str] = None  # 'queued', 'downloading', 'postprocessing', 'completed', 'failed'
+    downloaded_bytes: Optional[int] = None  # Bytes downloaded so far (all streams)
+    total_bytes: Optional[int] = None  # Expected total bytes, when known
+    speed: Optional[float] = None  # Current download speed in bytes/second
+    eta: Optional[int] = None  # Estimated seconds until the download finishes
+    outputs: Optional[Dict[str, str]] = None  # Format -> file path, for multi-format jobs
+    queue_position: Optional[int] = None  # 1-based position while waiting for a download slot
+    estimated_wait: Optional[float] = None  # Estimated seconds until the job starts downloading
 
 
 class ConversionResponse(BaseModel):
@@ -0,0 +1,117 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+from .models import FormatType
+
+# Same bitrates the single-format path passes to FFmpegExtractAudio
+MP3_BITRATES = {
+    FormatType.MP3: 192,
+    FormatType.MP3_48: 48,
+    FormatType.MP3_64: 64,
+    FormatType.MP3_128: 128,
+    FormatType.MP3_240: 240,
+    FormatType.MP3_320: 320,
+}
+
+MP4_HEIGHTS = {
+    FormatType.MP4_360: 360,
+    FormatType.MP4_720: 720,
+    FormatType.MP4_1080: 1080,
+    FormatType.MP4_1440: 1440,
+    FormatType.MP4_2160: 2160,
+}
+
+
+def output_extension(format_type: FormatType) -> str:
+    return '.mp3' if format_type in MP3_BITRATES else '.mp4'
+
+
+def output_name(job_id: str, format_type: FormatType) -> str:
+    """File name of one output of a multi-format job."""
+    return f"{job_id}.{format_type.value}{output_extension(format_type)}"
+
+
+def output_label(format_type: FormatType) -> str:
+    """Short label telling outputs of one job apart, e.g. "720p" or "128k"."""
+    if format_type in MP4_HEIGHTS:
+        return f"{MP4_HEIGHTS[format_type]}p"
+    return f"{MP3_BITRATES[format_type]}k"
+
+
+def source_format(formats: List[FormatType]) -> FormatType:
+    """The single download that can feed every requested format.
+
+    The highest requested video resolution when any video format is in the
+    set (its audio track feeds the MP3 outputs), else the audio stream.
+    """
+    videos = [f for f in formats if f in MP4_HEIGHTS]
+    if videos:
+        return max(videos, key=MP4_HEIGHTS.__getitem__)
+    return FormatType.MP3
+
+
+def validate_formats(formats: List[FormatType]) -> List[FormatType]:
+    """De-duplicate a requested format set, keeping order.
+
+    Raises ValueError for image formats, which have their own thumbnail
+    pipeline and share nothing with an audio/video decode.
+    """
+    unique = list(dict.fromkeys(formats))
+    if len(unique) > 1 and any(f not in MP3_BITRATES and f not in MP4_HEIGHTS for f in unique):
+        raise ValueError("Image formats can't be combined with other formats")
+    return unique
+
+
+class MultiOutputEncodePP(FFmpegPostProcessor):
+    """Encodes every requested format from the downloaded source in a single
+    ffmpeg run with one output per format.
+
+    ffmpeg decodes each input stream once and feeds all outputs from it, so
+    N formats cost one download and one decode instead of N of each.  The
+    highest video resolution that the source already matches is stream-
+    copied; smaller ones are scaled and encoded; MP3 outputs are encoded
+    from the source's audio track.  The source file is deleted afterwards.
+    Each output gets the job's ``-threads`` budget in its own arguments:
+    yt-dlp applies the shared ``ffmpeg`` postprocessor args to the first
+    output only.
+    """
+
+    def __init__(self, job_id: str, formats: List[FormatType], dest_dir: Path,
+                 metadata: Dict[str, str], threads: Optional[int] = None, downloader=None):
+        super().__init__(downloader)
+        self.job_id = job_id
+        self.formats = formats
+        self.dest_dir = dest_dir
+        self.metadata = metadata
+        self.threads = threads
+
+    def _output_args(self, format_type: FormatType, source_height: Optional[int]) -> List[str]:
+        if format_type in MP3_BITRATES:
+            args = ['-map', '0:a:0', '-vn', '-c:a', 'libmp3lame', '-b:a', f'{MP3_BITRATES[format_type]}k']
+        else:
+            height = MP4_HEIGHTS[format_type]
+            args = ['-map', '0:v:0', '-map', '0:a:0?']
+            if source_height and source_height > height:
+                args += ['-vf', f'scale=-2:{height}', '-c:v', 'libx264', '-preset', 'veryfast',
+                         '-crf', '23', '-c:a', 'copy']
+            else:
+                args += ['-c', 'copy']
+        if self.threads:
+            args += ['-threads', str(self.threads)]
+        for key, value in self.metadata.items():
+            if value:
+                args += ['-metadata', f'{key}={value}']
+        return args
+
+    def run(self, info):
+        source = info['filepath']
+        outputs = [
+            (str(self.dest_dir / output_name(self.job_id, f)), self._output_args(f, info.get('height')))
+            for f in self.formats
+        ]
+        self.to_screen(f'Encoding {len(outputs)} outputs from "{os.path.basename(source)}"')
+        self.real_run_ffmpeg([(source, [])], outputs)
+        return [source], info
@@ -0,0 +1,139 @@
+import time
+from typing import Dict, Optional
+
+from .jobs import JobRecord
+
+# Overall progress bands (percent) for each stage of a job
+DOWNLOAD_START = 10
+DOWNLOAD_END = 80
+POSTPROCESS_START = 85
+POSTPROCESS_END = 99
+
+
+def _format_speed(speed: Optional[float]) -> str:
+    if not speed:
+        return ""
+    for unit in ("B/s", "KB/s", "MB/s", "GB/s"):
+        if speed < 1024 or unit == "GB/s":
+            return f"{speed:.1f} {unit}"
+        speed /= 1024
+
+
+class ProgressTracker:
+    """Turns yt-dlp progress callbacks into numeric job record updates.
+
+    Progress is computed from byte counts rather than by parsing yt-dlp's
+    '_percent_str' display string.  When the download is split into separate
+    video and audio streams, bytes are summed across streams against the
+    expected total from the selected formats, so the bar doesn't jump back
+    to 0% when the second stream starts.
+
+    yt-dlp calls the hook many times per second; the job record is only
+    rewritten every ``min_interval`` seconds (and on every stage change), so
+    the hook itself stays cheap.
+
+    ffmpeg postprocessors don't report intermediate progress, so that stage
+    advances per postprocessor (merge, extract audio, metadata, thumbnail)
+    using yt-dlp's postprocessor hooks.
+    """
+
+    def __init__(self, job: JobRecord, postprocessor_count: int = 1, min_interval: float = 0.5):
+        self.job = job
+        self.postprocessor_count = max(postprocessor_count, 1)
+        self.min_interval = min_interval
+        self._downloaded: Dict[str, int] = {}
+        self._totals: Dict[str, int] = {}
+        self._expected_total = 0
+        self._postprocessors_done = 0
+        self._last_update = 0.0
+
+    def on_download(self, d: dict):
+        """yt-dlp progress hook.  Runs in the worker thread."""
+        if self.job.is_terminal:
+            # A worker still unwinding after the job failed (e.g. a stall)
+            # must not bring back a live speed or ETA.
+            return
+        status = d.get('status')
+        filename = d.get('filename') or ''
+
+        if status == 'downloading':
+            self._downloaded[filename] = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                self._totals[filename] = int(total)
+            if not self._expected_total:
+                self._expected_total = self._expected_from_formats(d.get('info_dict') or {})
+
+            now = time.monotonic()
+            if self.job.stage == "downloading" and now - self._last_update < self.min_interval:
+                return
+            self._last_update = now
+
+            downloaded = sum(self._downloaded.values())
+            total = max(self._expected_total, sum(self._totals.values()))
+            speed = d.get('speed')
+            eta = d.get('eta')
+
+            fields = {
+                "stage": "downloading",
+                "downloaded_bytes": downloaded,
+                "total_bytes": total or None,
+                "speed": round(speed, 1) if speed else None,
+                "eta": int(eta) if eta is not None else None,
+                "message": "Downloading...",
+            }
+            if total:
+                fraction = min(downloaded / total, 1.0)
+                fields["progress"] = max(
+                    self.job.progress,
+                    DOWNLOAD_START + int(fraction * (DOWNLOAD_END - DOWNLOAD_START)),
+                )
+                details = ", ".join(
+                    part for part in (
+                        _format_speed(speed),
+                        f"{int(eta)}s left" if eta is not None else "",
+                    ) if part
+                )
+                fields["message"] = f"Downloading... {fraction * 100:.1f}%" + (f" ({details})" if details else "")
+            self.job.update(**fields)
+
+        elif status == 'finished':
+            # One stream done — either the next starts or ffmpeg takes over.
+            # Progress only moves forward, so a second stream whose size is
+            # not known yet can't pull the bar back.
+            if filename in self._totals:
+                self._downloaded[filename] = self._totals[filename]
+            self.job.update(speed=None, eta=None)
+
+    def on_postprocess(self, d: dict):
+        """yt-dlp postprocessor hook.  Runs in the worker thread."""
+        if self.job.is_terminal:
+            return
+        name = d.get('postprocessor') or 'postprocessor'
+        status = d.get('status')
+        fields = {}
+        if status == 'started':
+            fields["stage"] = "postprocessing"
+            fields["message"] = f"Processing ({name})..."
+        elif status == 'finished':
+            self._postprocessors_done += 1
+        else:
+            return
+        fraction = min(self._postprocessors_done / self.postprocessor_count, 1.0)
+        fields["progress"] = max(
+            self.job.progress,
+            POSTPROCESS_START + int(fraction * (POSTPROCESS_END - POSTPROCESS_START)),
+        )
+        self.job.update(**fields)
+
+    @staticmethod
+    def _expected_from_formats(info: dict) -> int:
+        """Sum of the selected formats' (approximate) sizes, if known."""
+        formats = info.get('requested_formats') or [info]
+        total = 0
+        for fmt in formats:
+            size = fmt.get('filesize') or fmt.get('filesize_approx')
+            if not size:
+                return 0
+            total += int(size)
+        return total
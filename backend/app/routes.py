@@ -1,28 +1,198 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from pydantic import BaseModel
+from typing import Optional
+import hashlib
+import ipaddress
 import logging
+import os
 
-from .models import ConvertRequest, VideoInfo, JobStatus, ConversionResponse, ErrorResponse
+from .models import ConvertRequest, FormatType, VideoInfo, JobStatus, ConversionResponse, ErrorResponse
 from .converter import converter, create_job, get_job_status
+from .canonical import EXTRACTORS, CanonicalKey, canonical_url, canonicalize
+from .cluster import NodeUnavailable, get_cluster
+from .concurrency import get_concurrency_controller
+from .cpubudget import get_cpu_budget
+from .memory import get_memory_governor
+from .multioutput import output_label, validate_formats
+from .speculation import get_speculator, speculation_enabled
+from .tracing import debug_endpoints_enabled, get_tracer
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["converter"])
 
+
+def _trusted_proxies() -> list:
+    """Networks allowed to set X-Real-IP (TRUSTED_PROXIES, default loopback)."""
+    spec = os.getenv("TRUSTED_PROXIES", "127.0.0.1/32,::1/128")
+    return [ipaddress.ip_network(n.strip(), strict=False) for n in spec.split(",") if n.strip()]
+
+
+def _from_trusted_proxy(host: str | None) -> bool:
+    if not host:
+        return False
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in _trusted_proxies())
+
+
+def _client_ip(req: Request) -> str:
+    """The caller's IP: X-Real-IP when set by a trusted proxy, else the peer."""
+    peer = req.client.host if req.client else None
+    return (req.headers.get("x-real-ip") if _from_trusted_proxy(peer) else None) or peer or "unknown"
+
+
+def _client_key(req: Request) -> str:
+    """Identify the caller for fair-share scheduling.
+
+    A known API key (listed in API_KEYS) wins; otherwise the client IP, taken
+    from nginx's X-Real-IP header when present since behind the proxy every
+    request would otherwise come from 127.0.0.1.  The header is only honoured
+    from TRUSTED_PROXIES — anyone else could rotate it to get a fresh
+    fair-share identity per request.  API keys are identified by
+    a digest — the key is journaled with the job and must not be stored.
+    """
+    api_key = req.headers.get("x-api-key")
+    if api_key:
+        allowed = {k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()}
+        if api_key in allowed:
+            return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+    return f"ip:{_client_ip(req)}"
+
+
+def _cached_json(req: Request, model: BaseModel, max_age: int) -> Response:
+    """Serialize *model* with Cache-Control and a content ETag, answering a
+    matching If-None-Match with 304 so nginx and browsers can revalidate."""
+    body = model.model_dump_json().encode()
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    headers = {"Cache-Control": f"public, max-age={max_age}", "ETag": etag}
+    # nginx weakens ETags (W/"...") when it compresses the response
+    candidates = {
+        tag.strip().removeprefix("W/")
+        for tag in req.headers.get("if-none-match", "").split(",")
+    }
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def _forward_job_request(req: Request, job_id: str) -> Optional[Response]:
+    """In cluster mode, pass a request for a job created on another node to
+    that node.  Returns None when the job is (or may be) local."""
+    cluster = get_cluster()
+    node = cluster and cluster.remote(req, cluster.job_node(job_id))
+    if not node:
+        return None
+    try:
+        return await cluster.forward(req, node, client_ip=_client_ip(req))
+    except NodeUnavailable as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=502, detail=f"Node {e.node} is unavailable")
+
+
+async def _forward_video_request(req: Request, url: str, body: Optional[bytes] = None) -> Optional[Response]:
+    """In cluster mode, pass a request about a video to the node that owns
+    it.  Returns None to serve it here — also when the owner is down, since
+    affinity only saves work and shouldn't cost availability."""
+    cluster = get_cluster()
+    node = cluster and cluster.remote(req, cluster.owner(url))
+    if not node:
+        return None
+    try:
+        return await cluster.forward(req, node, body, client_ip=_client_ip(req))
+    except NodeUnavailable as e:
+        logger.warning(f"{e}; serving locally")
+        return None
+
+
 @router.get("/version")
 async def version():
     return {"message": "v1.0.0"}
 
+@router.get("/concurrency")
+async def concurrency_status():
+    """Current concurrent-job limit, its bounds, recent controller decisions,
+    memory governor state (RSS, recent per-job peaks) and per-job CPU shares"""
+    return {
+        **get_concurrency_controller().status(),
+        "memory": get_memory_governor().stats(),
+        "cpu_budget": get_cpu_budget().stats(),
+    }
+
+@router.get("/cluster")
+async def cluster_status():
+    """Cluster membership and forwarded-request counts (404 unless
+    CLUSTER_NODES is set)"""
+    cluster = get_cluster()
+    if cluster is None:
+        raise HTTPException(status_code=404, detail="Cluster mode is not enabled")
+    return cluster.stats()
+
+@router.get("/debug/trace/{job_id}")
+async def job_trace(job_id: str):
+    """Timing spans (and profile, if sampled) recorded for a job.
+
+    Only available when DEBUG_TRACE_ENDPOINT is enabled.
+    """
+    if not debug_endpoints_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    trace = get_tracer().get(job_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace for this job")
+    return trace.to_dict()
+
 @router.get("/info", response_model=VideoInfo)
-async def get_video_info(url: str):
+async def get_video_info(url: str, req: Request):
     """
     Get video metadata without downloading
     
     - **url**: YouTube video URL
+
+    Recognised YouTube/Instagram URLs are redirected to their canonical
+    /info/{extractor}/{video_id} form, so every link shape for the same
+    video shares one cache entry.
+    """
+    key = canonicalize(url)
+    if key is not None:
+        # The mapping never changes, so the redirect itself is cacheable too
+        return RedirectResponse(
+            f"{router.prefix}/info/{key.extractor}/{key.video_id}",
+            status_code=308,
+            headers={"Cache-Control": "public, max-age=86400"},
+        )
+    forwarded = await _forward_video_request(req, url)
+    if forwarded is not None:
+        return forwarded
+    return await _video_info_response(req, url)
+
+
+@router.get("/info/{extractor}/{video_id}", response_model=VideoInfo)
+async def get_canonical_video_info(extractor: str, video_id: str, req: Request):
     """
+    Get video metadata by canonical key (see /info)
+    """
+    if extractor not in EXTRACTORS:
+        raise HTTPException(status_code=404, detail="Unknown extractor")
+    url = CanonicalKey(extractor, video_id).url
+    forwarded = await _forward_video_request(req, url)
+    if forwarded is not None:
+        return forwarded
+    return await _video_info_response(req, url)
+
+
+async def _video_info_response(req: Request, url: str) -> Response:
     try:
-        info = await converter.get_video_info(url)
-        return info
+        if speculation_enabled():
+            key = canonical_url(url)
+            info = get_speculator().cached_info(key) or await converter.get_video_info(url)
+            # Warm up the likely conversion while the user picks a format
+            get_speculator().on_info(key, info)
+        else:
+            info = await converter.get_video_info(url)
+        return _cached_json(req, info, int(os.getenv("INFO_CACHE_SECONDS", "3600")))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -37,15 +207,32 @@ async def convert_video(request: ConvertRequest, background_tasks: BackgroundTas
     
     - **url**: YouTube video URL
     - **format**: Output format (mp3, mp4-360, mp4-720, mp4-1080)
+    - **formats**: Optional additional formats, encoded from the same download
     """
     try:
+        formats = validate_formats([request.format, *(request.formats or [])])
+        multi = len(formats) > 1
+
+        # The job runs (and its id is issued) on the node that owns the video
+        forwarded = await _forward_video_request(req, request.url, await req.body())
+        if forwarded is not None:
+            return forwarded
+
         # Get website URL from request (just host, no protocol)
         website_url = req.headers.get("host", f"{req.client.host}:{req.url.port}")
         
         # Create job immediately — don't re-fetch video info here since the
         # frontend already fetched it via /api/info.  Starting the background
         # task right away saves 5-10 s of redundant yt-dlp metadata work.
-        job_id = create_job(request.url, request.format)
+        client_id = _client_key(req)
+        job_id = create_job(request.url, request.format, website_url, client_id, formats)
+        
+        # In speculative mode /api/info already resolved the metadata
+        prefetched_info = None
+        if speculation_enabled():
+            if not multi:
+                get_speculator().record_request(request.format)
+            prefetched_info = get_speculator().cached_info(canonical_url(request.url))
         
         # Start conversion in background
         background_tasks.add_task(
@@ -54,9 +241,12 @@ async def convert_video(request: ConvertRequest, background_tasks: BackgroundTas
             request.url,
             request.format,
             website_url,
+            prefetched_info=prefetched_info,
+            client_id=client_id,
+            formats=formats if multi else None,
         )
         
-        logger.info(f"Started conversion job {job_id} for format {request.format}")
+        logger.info(f"Started conversion job {job_id} for format(s) {', '.join(f.value for f in formats)}")
         
         return ConversionResponse(job_id=job_id)
     
@@ -68,29 +258,46 @@ async def convert_video(request: ConvertRequest, background_tasks: BackgroundTas
 
 
 @router.get("/status/{job_id}", response_model=JobStatus)
-async def get_status(job_id: str):
+async def get_status(job_id: str, req: Request):
     """
     Get conversion job status
     
     - **job_id**: Job identifier returned from /convert
     """
+    forwarded = await _forward_job_request(req, job_id)
+    if forwarded is not None:
+        return forwarded
+
     job = get_job_status(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return job
+    # A finished job's status no longer changes — let caches absorb the
+    # final polls.  In-flight statuses must always reach the backend.
+    if job.status in ("completed", "failed"):
+        return _cached_json(req, job, int(os.getenv("STATUS_CACHE_SECONDS", "300")))
+    return Response(
+        job.model_dump_json(),
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"},
+    )
 
 
 @router.get("/download/{job_id}")
-async def download_file(job_id: str):
+async def download_file(job_id: str, req: Request, format: Optional[FormatType] = None):
     """
     Download converted file
     
     - **job_id**: Job identifier returned from /convert
+    - **format**: Which output of a multi-format job (default: the primary one)
     """
     import re
     
+    forwarded = await _forward_job_request(req, job_id)
+    if forwarded is not None:
+        return forwarded
+
     job = get_job_status(job_id)
     
     if not job:
@@ -99,7 +306,7 @@ async def download_file(job_id: str):
     if job.status != "completed":
         raise HTTPException(status_code=400, detail=f"Job is not completed (status: {job.status})")
     
-    file_path = converter.get_file_path(job_id)
+    file_path = converter.get_file_path(job_id, format)
     
     if not file_path or not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
@@ -123,6 +330,9 @@ async def download_file(job_id: str):
         # Sanitize the title for filename (remove invalid characters)
         safe_title = re.sub(r'[<>:"/\\|?*]', '', job.video_title)
         safe_title = safe_title.strip()[:100]  # Limit length
+        # Other outputs of a multi-format job would share the primary's name
+        if format is not None and format.value != job.format:
+            safe_title = f"{safe_title} ({output_label(format)})"
         download_filename = f"{safe_title}{extension}"
     else:
         download_filename = file_path.name
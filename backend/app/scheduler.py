@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class _Ticket:
+    """One job's place in the scheduler (queued or running)."""
+
+    __slots__ = (
+        "job_id", "client", "cost", "background", "start_tag", "finish_tag",
+        "seq", "future", "granted_at",
+    )
+
+    def __init__(self, job_id: str, client: str, cost: float, start_tag: float, seq: int, background: bool):
+        self.job_id = job_id
+        self.client = client
+        self.cost = cost
+        self.background = background
+        self.start_tag = start_tag
+        self.finish_tag = start_tag + cost
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.granted_at: Optional[float] = None
+
+
+class FairScheduler:
+    """Weighted fair-share admission in front of the download executor.
+
+    Each job carries an estimated cost (duration × format weight, see
+    costs.py).  Jobs are tagged start-time-fair-queuing style: a client's
+    next job starts, in virtual time, where its previous job finished, so a
+    client that submits a 3-hour 2160p video has pushed its own tags far
+    ahead and everyone else's 10-second audio jobs are dispatched first.
+    Clients get equal shares; within a client, jobs run in order.
+
+    Background work (speculative prefetches) only runs when nothing else is
+    queued, and never takes the last free slot.
+
+    Everything here runs on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, capacity: int = 2):
+        self.capacity = capacity
+        self._queued: List[_Ticket] = []
+        self._running: Dict[str, _Ticket] = {}
+        self._client_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        # Observed wall-clock seconds per unit of cost (EWMA), used for the
+        # wait estimates exposed in JobStatus.
+        self._seconds_per_cost = 1.0
+
+    # ── Admission ─────────────────────────────────────────────────────────────
+    @asynccontextmanager
+    async def slot(self, job_id: str, client: str, cost: float, background: bool = False):
+        """Wait for a fair-share slot, hold it for the body, then release it."""
+        start_tag = max(self._virtual_time, self._client_finish.get(client, 0.0))
+        ticket = _Ticket(job_id, client, cost, start_tag, next(self._seq), background)
+        self._client_finish[client] = ticket.finish_tag
+        self._queued.append(ticket)
+        self._dispatch()
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket in self._queued:
+                self._queued.remove(ticket)
+            elif self._running.pop(job_id, None) is not None:
+                self._dispatch()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def _release(self, ticket: _Ticket):
+        self._running.pop(ticket.job_id, None)
+        if ticket.granted_at is not None and ticket.cost > 0:
+            observed = (time.monotonic() - ticket.granted_at) / ticket.cost
+            self._seconds_per_cost = 0.8 * self._seconds_per_cost + 0.2 * observed
+        if not self._queued and not self._running:
+            # Idle — forget history so old tags don't penalise returning clients.
+            self._client_finish.clear()
+            self._virtual_time = 0.0
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._queued and len(self._running) < self.capacity:
+            ticket = min(self._queued, key=self._order)
+            if ticket.background and len(self._running) >= self.capacity - 1:
+                break
+            self._queued.remove(ticket)
+            self._virtual_time = max(self._virtual_time, ticket.start_tag)
+            ticket.granted_at = time.monotonic()
+            self._running[ticket.job_id] = ticket
+            if not ticket.future.done():
+                ticket.future.set_result(None)
+
+    def set_capacity(self, capacity: int):
+        """Change the number of concurrent slots (takes effect immediately)."""
+        self.capacity = max(capacity, 1)
+        self._dispatch()
+
+    # ── Introspection ─────────────────────────────────────────────────────────
+    @staticmethod
+    def _order(ticket: _Ticket):
+        return (ticket.background, ticket.finish_tag, ticket.seq)
+
+    def _ordered_queue(self) -> List[_Ticket]:
+        return sorted(self._queued, key=self._order)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job, or None if it isn't queued."""
+        for index, ticket in enumerate(self._ordered_queue()):
+            if ticket.job_id == job_id:
+                return index + 1
+        return None
+
+    def estimated_wait(self, job_id: str) -> Optional[float]:
+        """Estimated seconds until a queued job gets a slot, or None."""
+        now = time.monotonic()
+        spc = self._seconds_per_cost
+        # Work still left on running jobs, plus every queued job ahead of us.
+        remaining = sum(
+            max(t.cost * spc - (now - (t.granted_at or now)), 0.0)
+            for t in self._running.values()
+        )
+        for ticket in self._ordered_queue():
+            if ticket.job_id == job_id:
+                return round(remaining / max(self.capacity, 1), 1)
+            remaining += ticket.cost * spc
+        return None
+
+    def job_ids(self) -> Set[str]:
+        """Ids of every job currently queued or holding a slot."""
+        return {t.job_id for t in self._queued} | set(self._running)
+
+    def stats(self) -> dict:
+        """Snapshot of the scheduler's state, for logs and debugging."""
+        return {
+            "capacity": self.capacity,
+            "running": len(self._running),
+            "queued": sum(1 for t in self._queued if not t.background),
+            "background": sum(1 for t in self._queued if t.background)
+            + sum(1 for t in self._running.values() if t.background),
+            "clients": len({t.client for t in self._queued} | {t.client for t in self._running.values()}),
+            "seconds_per_cost": round(self._seconds_per_cost, 3),
+        }
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_scheduler: FairScheduler | None = None
+
+
+def get_scheduler() -> FairScheduler:
+    """Return (or create) the global fair-share scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(capacity=int(os.getenv("MAX_CONCURRENT_JOBS", "2")))
+    return _scheduler
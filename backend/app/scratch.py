@@ -0,0 +1,92 @@
+import errno
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class ScratchSpace:
+    """Per-job working directories kept apart from finished downloads.
+
+    yt-dlp writes everything it produces for a job — .part files, separate
+    video/audio streams, fragments, thumbnails — into ``<root>/<job_id>/``.
+    Only the final artifact is moved into the download directory, with an
+    atomic rename, and the job's scratch directory is then removed in one
+    go.  The download directory therefore only ever holds finished files,
+    and the scratch root can sit on faster storage (tmpfs, local NVMe).
+
+    Scratch directories are deterministic per job id, so a job resumed after
+    a restart finds its partial downloads where it left them.
+    """
+
+    def __init__(self, root: Path, publish_dir: Path):
+        self.root = root
+        self.publish_dir = publish_dir
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, job_id: str) -> Path:
+        """Return (creating it if needed) the scratch directory for *job_id*."""
+        path = self.root / job_id
+        path.mkdir(exist_ok=True)
+        return path
+
+    def publish(self, src: Path, name: str) -> Path:
+        """Atomically move a finished artifact into the download directory.
+
+        Same filesystem: a plain rename.  Scratch on another device: copy
+        next to the destination under a temporary dot-name first, then
+        rename, so readers never see a half-written file.
+        """
+        dest = self.publish_dir / name
+        try:
+            os.replace(src, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            tmp = self.publish_dir / f".{name}.tmp"
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+            src.unlink()
+        return dest
+
+    def discard(self, job_id: str):
+        """Remove a job's scratch directory and everything in it."""
+        shutil.rmtree(self.root / job_id, ignore_errors=True)
+
+    def adopt(self, from_id: str, to_id: str) -> bool:
+        """Hand one job's scratch files over to another job id.
+
+        Files are renamed to the new id so yt-dlp, running with the new
+        job's output template, recognises them as already downloaded.
+        """
+        src = self.root / from_id
+        if not src.is_dir():
+            return False
+        dest = self.root / to_id
+        if dest.exists():
+            shutil.rmtree(dest, ignore_errors=True)
+        src.rename(dest)
+        for path in dest.iterdir():
+            if path.name.startswith(from_id):
+                path.rename(path.with_name(to_id + path.name[len(from_id):]))
+        return True
+
+    def sweep(self, cutoff: datetime, active_ids: Iterable[str]) -> int:
+        """Remove scratch directories untouched since *cutoff* that don't
+        belong to an active job.  Returns the number removed."""
+        active = set(active_ids)
+        removed = 0
+        for path in self.root.iterdir():
+            if not path.is_dir() or path.name in active:
+                continue
+            try:
+                if datetime.fromtimestamp(path.stat().st_mtime) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError as e:
+                logger.error(f"Error sweeping scratch dir {path}: {e}")
+        return removed
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional, Set, Tuple
+
+from .costs import estimate_job_cost
+from .images import is_image_format
+from .models import FormatType, VideoInfo
+from .scheduler import get_scheduler
+from .scratch import ScratchSpace
+from .watchdog import DownloadAborted
+
+logger = logging.getLogger(__name__)
+
+# Scheduler client key shared by all speculative downloads.
+_SPECULATIVE_CLIENT = "speculative"
+
+
+class _Speculation:
+    """A low-priority source download started from /api/info."""
+
+    __slots__ = ("spec_id", "format_type", "task", "abort", "started", "ready", "claimed")
+
+    def __init__(self, format_type: FormatType):
+        self.spec_id = f"spec-{uuid.uuid4()}"
+        self.format_type = format_type
+        self.task: Optional[asyncio.Task] = None
+        # Set from the event loop, read by the worker thread's progress hook.
+        self.abort = threading.Event()
+        self.started = False
+        self.ready = False
+        self.claimed = False
+
+
+class SpeculativePrefetcher:
+    """Opt-in warm-up of likely conversions when /api/info is called.
+
+    The frontend always calls /api/info, lets the user pick a format and only
+    then calls /api/convert.  In speculative mode /api/info:
+
+      - caches the resolved VideoInfo, so the convert job skips its own
+        metadata round-trip;
+      - for videos no longer than ``max_duration`` seconds, starts
+        downloading the source stream for the most commonly requested format
+        as a *background* scheduler job (it never delays real jobs).
+
+    When a matching convert arrives it claims the download: its scratch
+    directory is handed over to the new job's id and yt-dlp, seeing the
+    files already on disk, goes straight to postprocessing.  Unclaimed downloads are aborted and
+    deleted after ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        scratch: ScratchSpace,
+        max_duration: float = 180,
+        ttl: float = 120,
+        max_inflight: int = 2,
+        info_ttl: float = 600,
+    ):
+        self.scratch = scratch
+        self.max_duration = max_duration
+        self.ttl = ttl
+        self.max_inflight = max_inflight
+        self.info_ttl = info_ttl
+        self._info: Dict[str, Tuple[VideoInfo, float]] = {}
+        self._specs: Dict[str, _Speculation] = {}
+        self._format_counts: Counter = Counter()
+
+    # ── Metadata warm cache ───────────────────────────────────────────────────
+    def cached_info(self, key: str) -> Optional[VideoInfo]:
+        entry = self._info.get(key)
+        if entry is None:
+            return None
+        info, expires = entry
+        if time.monotonic() > expires:
+            self._info.pop(key, None)
+            return None
+        return info
+
+    def _remember_info(self, key: str, info: VideoInfo):
+        now = time.monotonic()
+        if len(self._info) > 1000:
+            self._info = {k: v for k, v in self._info.items() if v[1] > now}
+        self._info[key] = (info, now + self.info_ttl)
+
+    # ── Format popularity ─────────────────────────────────────────────────────
+    def record_request(self, format_type: FormatType):
+        """Count a convert request towards the format popularity ranking."""
+        if not is_image_format(format_type):
+            self._format_counts[format_type] += 1
+
+    def predicted_format(self) -> FormatType:
+        """Most commonly requested non-image format (MP3 until we know)."""
+        if self._format_counts:
+            return self._format_counts.most_common(1)[0][0]
+        return FormatType.MP3
+
+    # ── Speculation lifecycle ─────────────────────────────────────────────────
+    def on_info(self, key: str, info: VideoInfo):
+        """Called after /api/info resolves the canonical URL *key*."""
+        self._remember_info(key, info)
+
+        if not info.duration or info.duration > self.max_duration:
+            return
+        if key in self._specs or len(self._specs) >= self.max_inflight:
+            return
+
+        spec = _Speculation(self.predicted_format())
+        self._specs[key] = spec
+        spec.task = asyncio.create_task(self._run(spec, key, info))
+        asyncio.get_running_loop().call_later(self.ttl, self._expire, key, spec)
+        logger.debug(f"Speculative {spec.format_type.value} download {spec.spec_id} for {key}")
+
+    async def _run(self, spec: _Speculation, url: str, info: VideoInfo):
+        # Import here to avoid a circular import at module load time
+        from .converter import converter, download_executor
+
+        ydl_opts = converter._get_format_options(
+            spec.format_type, url, duration=info.duration, job_id=spec.spec_id,
+        )
+        # Source stream only — the claiming job runs the postprocessors.
+        ydl_opts['postprocessors'] = []
+        ydl_opts['writethumbnail'] = False
+
+        def abort_hook(d):
+            if spec.abort.is_set():
+                raise DownloadAborted("speculative download expired")
+
+        ydl_opts['progress_hooks'] = [abort_hook]
+
+        try:
+            cost = estimate_job_cost(info.duration, spec.format_type)
+            async with get_scheduler().slot(spec.spec_id, _SPECULATIVE_CLIENT, cost, background=True):
+                if spec.abort.is_set():
+                    return
+                spec.started = True
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(download_executor(), converter._download_video, url, ydl_opts)
+            spec.ready = True
+        except Exception as e:
+            logger.debug(f"Speculative download {spec.spec_id} ended: {e}")
+        finally:
+            if not spec.ready or (spec.abort.is_set() and not spec.claimed):
+                self._discard_files(spec)
+
+    def _expire(self, key: str, spec: _Speculation):
+        if spec.claimed:
+            return
+        if self._specs.get(key) is spec:
+            self._specs.pop(key)
+        spec.abort.set()
+        if spec.task and not spec.started:
+            spec.task.cancel()
+        elif spec.task and spec.task.done():
+            self._discard_files(spec)
+        # A running download unwinds at its next progress hook and its
+        # task's finally block removes the partial files.
+
+    async def claim(self, key: str, format_type: FormatType, job_id: str) -> bool:
+        """Hand a matching speculative download over to *job_id*.
+
+        Waits for the download if it is still running — at most ``ttl``
+        seconds, since speculative downloads run without a watchdog; a
+        stalled one is aborted and the job downloads normally.  Returns True
+        when the source files are now on disk under *job_id*'s name.
+        """
+        spec = self._specs.get(key)
+        if spec is None or spec.format_type != format_type or spec.abort.is_set():
+            return False
+        self._specs.pop(key)
+        spec.claimed = True
+
+        if not spec.started:
+            # Still queued behind real work — not worth waiting for.
+            spec.task.cancel()
+            return False
+
+        try:
+            await asyncio.wait_for(asyncio.shield(spec.task), timeout=self.ttl)
+        except asyncio.TimeoutError:
+            logger.warning(f"Speculative download {spec.spec_id} too slow for job {job_id}, aborting it")
+            # Unclaimed again, so the task's cleanup removes its files
+            # whenever its worker unwinds.
+            spec.claimed = False
+            spec.abort.set()
+            return False
+        except Exception:
+            return False
+        if not spec.ready:
+            return False
+
+        if not self.scratch.adopt(spec.spec_id, job_id):
+            return False
+        logger.info(f"Job {job_id} claimed speculative download {spec.spec_id}")
+        return True
+
+    def scratch_ids(self) -> Set[str]:
+        """Scratch directory names owned by pending speculative downloads."""
+        return {spec.spec_id for spec in self._specs.values()}
+
+    def _discard_files(self, spec: _Speculation):
+        self.scratch.discard(spec.spec_id)
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_speculator: SpeculativePrefetcher | None = None
+
+
+def speculation_enabled() -> bool:
+    return os.getenv("SPECULATIVE_PREFETCH", "false").lower() in ("1", "true", "yes")
+
+
+def get_speculator() -> SpeculativePrefetcher:
+    """Return (or create) the global speculative prefetcher."""
+    global _speculator
+    if _speculator is None:
+        # Import here to avoid a circular import at module load time
+        from .converter import converter
+
+        _speculator = SpeculativePrefetcher(
+            converter.scratch,
+            max_duration=float(os.getenv("SPECULATIVE_MAX_DURATION_SECONDS", "180")),
+            ttl=float(os.getenv("SPECULATIVE_TTL_SECONDS", "120")),
+            max_inflight=int(os.getenv("SPECULATIVE_MAX_INFLIGHT", "2")),
+        )
+    return _speculator
@@ -0,0 +1,140 @@
+"""Lightweight host/container resource readings from /proc and cgroup v2.
+
+Everything here is Linux-only and degrades to ``None`` elsewhere (Windows /
+macOS dev machines), the same way release_memory() skips malloc_trim.  No
+third-party dependency is needed for the handful of numbers we sample.
+"""
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+_CGROUP = Path("/sys/fs/cgroup")
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text()
+    except OSError:
+        return None
+
+
+def effective_cpu_count() -> int:
+    """Cores this process may actually use.
+
+    Honours the CPU affinity mask and a cgroup v2 ``cpu.max`` quota, so a
+    container limited to 2 CPUs on a 32-core host reports 2.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cores = os.cpu_count() or 1
+
+    cpu_max = _read(_CGROUP / "cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.strip().partition(" ")
+        if quota != "max" and period:
+            try:
+                cores = min(cores, max(int(int(quota) / int(period)), 1))
+            except ValueError:
+                pass
+    return max(cores, 1)
+
+
+def cpu_affinity() -> Optional[List[int]]:
+    """Sorted ids of the cores this process may run on (None if unknown)."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return None
+
+
+def cpu_time_seconds() -> Optional[Tuple[float, float, int]]:
+    """Return (busy CPU seconds, wall-clock timestamp, cores) for utilisation
+    deltas; busy seconds over elapsed × cores is the utilisation.
+
+    Uses the cgroup's own usage counter when running in a container so that
+    neighbours on the host don't count against us, measured against the
+    cores we may use.  The fallback, host-wide /proc/stat, is measured
+    against all of the host's cores — dividing host-wide load by a smaller
+    quota would count other tenants' work as ours.
+    """
+    now = time.monotonic()
+    stat = _read(_CGROUP / "cpu.stat")
+    if stat:
+        for line in stat.splitlines():
+            if line.startswith("usage_usec"):
+                return int(line.split()[1]) / 1_000_000, now, effective_cpu_count()
+
+    proc = _read(Path("/proc/stat"))
+    if proc:
+        lines = proc.splitlines()
+        values = [int(v) for v in lines[0].split()[1:]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+        ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        host_cores = sum(1 for line in lines[1:] if line.startswith("cpu")) or os.cpu_count() or 1
+        # /proc/stat is summed over all cores; normalise to "core-seconds".
+        return (sum(values) - idle) / ticks, now, host_cores
+    return None
+
+
+def memory_usage_fraction() -> Optional[float]:
+    """Fraction (0-1) of the memory limit currently in use.
+
+    The cgroup limit (memory.max) is what the OOM killer enforces inside a
+    container, so prefer it; otherwise use MemAvailable from /proc/meminfo.
+    memory.current includes page cache, which downloads and ffmpeg writes
+    fill quickly and the kernel reclaims under pressure, so the working set
+    (current minus inactive_file, as kubelet and docker stats report) is
+    used instead.
+    """
+    current = _read(_CGROUP / "memory.current")
+    limit = _read(_CGROUP / "memory.max")
+    if current and limit and limit.strip() != "max":
+        try:
+            usage = int(current)
+            stat = _read(_CGROUP / "memory.stat") or ""
+            for line in stat.splitlines():
+                if line.startswith("inactive_file "):
+                    usage = max(usage - int(line.split()[1]), 0)
+                    break
+            return usage / int(limit)
+        except (ValueError, ZeroDivisionError):
+            pass
+
+    meminfo = _read(Path("/proc/meminfo"))
+    if meminfo:
+        values = {}
+        for line in meminfo.splitlines():
+            key, _, rest = line.partition(":")
+            values[key] = int(rest.split()[0]) if rest.split() else 0
+        total = values.get("MemTotal")
+        available = values.get("MemAvailable")
+        if total and available is not None:
+            return 1 - available / total
+    return None
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process in bytes."""
+    statm = _read(Path("/proc/self/statm"))
+    if statm:
+        try:
+            return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (IndexError, ValueError):
+            pass
+    return None
+
+
+def network_bytes_received() -> Optional[int]:
+    """Total bytes received on all non-loopback interfaces."""
+    netdev = _read(Path("/proc/net/dev"))
+    if not netdev:
+        return None
+    total = 0
+    for line in netdev.splitlines()[2:]:
+        iface, _, data = line.partition(":")
+        if iface.strip() == "lo" or not data:
+            continue
+        total += int(data.split()[0])
+    return total
@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Substrings in yt-dlp error messages that mean Instagram is pushing back.
+_RATE_LIMIT_MARKERS = (
+    "429",
+    "403",
+    "too many requests",
+    "rate-limit",
+    "rate limit",
+    "please wait a few minutes",
+)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return True if *error* looks like an Instagram 403/429 rejection."""
+    message = str(error).lower()
+    return any(marker in message for marker in _RATE_LIMIT_MARKERS)
+
+
+class InstagramThrottle:
+    """Process-wide rate governor for Instagram requests.
+
+    Every Instagram job (metadata fetch or download) calls acquire() from its
+    worker thread before talking to Instagram, and reports rejections with
+    record_failure().  While traffic is healthy acquire() returns immediately
+    and no yt-dlp sleep options are added.  Delays kick in only when:
+
+      - the request rate over the sliding window reaches ``max_requests``
+        (requests are spaced out so the window never overflows), or
+      - 429s (or a high 403 rate) were seen recently — each one raises a backoff
+        level that adds spacing between jobs and turns yt-dlp's own
+        sleep_requests / sleep_interval back on.  The level decays by one
+        step for every quiet window.
+
+    Because all jobs share one instance, concurrent downloads coordinate
+    instead of each sleeping blindly.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 60,
+        max_requests: int = 20,
+        max_backoff_level: int = 4,
+        backoff_step_seconds: float = 2.0,
+        error_rate_threshold: float = 0.2,
+    ):
+        self.window_seconds = window_seconds
+        self.max_requests = max_requests
+        self.max_backoff_level = max_backoff_level
+        self.backoff_step_seconds = backoff_step_seconds
+        self.error_rate_threshold = error_rate_threshold
+        self._requests: deque[float] = deque()
+        self._errors: deque[float] = deque()
+        self._backoff_level = 0
+        self._last_error_at = 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    # ── Internal helpers (call with the lock held) ───────────────────────────
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._errors and self._errors[0] < cutoff:
+            self._errors.popleft()
+
+    def _current_level(self, now: float) -> int:
+        if self._backoff_level and self._last_error_at:
+            quiet_windows = int((now - self._last_error_at) // self.window_seconds)
+            if quiet_windows:
+                self._backoff_level = max(self._backoff_level - quiet_windows, 0)
+                self._last_error_at = now if self._backoff_level else 0.0
+        return self._backoff_level
+
+    # ── Public API ────────────────────────────────────────────────────────────
+    @property
+    def backoff_level(self) -> int:
+        with self._lock:
+            return self._current_level(time.monotonic())
+
+    def acquire(self) -> float:
+        """Block until this request may proceed; return the seconds waited.
+
+        Must be called from a worker thread, never from the event loop.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            level = self._current_level(now)
+
+            start = max(now, self._next_slot)
+            if len(self._requests) >= self.max_requests:
+                # Window is full — wait until the oldest request ages out.
+                start = max(start, self._requests[0] + self.window_seconds)
+
+            # While backing off, space jobs out by a fixed step per level.
+            spacing = level * self.backoff_step_seconds
+            self._next_slot = start + spacing
+            self._requests.append(start)
+
+        delay = start - now
+        if delay > 0:
+            logger.info(f"Instagram throttle: delaying request {delay:.1f}s (backoff level {level})")
+            time.sleep(delay)
+        return delay
+
+    def record_failure(self, error: BaseException) -> bool:
+        """Report a failed request.  Returns True if it counted as a 403/429.
+
+        An explicit 429 / rate-limit message always raises the backoff level.
+        A bare 403 only does so once the window's error rate crosses
+        ``error_rate_threshold`` — Instagram's CDN 403s now and then on its
+        own, and extractor retries already absorb those.
+        """
+        if not is_rate_limit_error(error):
+            return False
+        message = str(error).lower()
+        explicit = "403" not in message or "429" in message
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._errors.append(now)
+            requests = max(len(self._requests), 1)
+            if explicit or len(self._errors) / requests >= self.error_rate_threshold:
+                self._backoff_level = min(self._current_level(now) + 1, self.max_backoff_level)
+                self._last_error_at = now
+        logger.warning(f"Instagram rate-limit response: {self.stats()}")
+        return True
+
+    def yt_dlp_sleep_options(self) -> dict:
+        """Return yt-dlp sleep options for the current backoff level.
+
+        Empty while healthy, so jobs run without any artificial delay.
+        """
+        level = self.backoff_level
+        if not level:
+            return {}
+        return {
+            # Same values the old fixed policy used, scaled by the level.
+            'sleep_requests': 1.5 * level,
+            'sleep_interval': 2 * level,
+            'max_sleep_interval': 5 * level,
+        }
+
+    def stats(self) -> dict:
+        """Snapshot of the governor's state, for logs and debugging."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            requests = len(self._requests)
+            errors = len(self._errors)
+            return {
+                "requests_in_window": requests,
+                "errors_in_window": errors,
+                "error_rate": round(errors / requests, 3) if requests else 0.0,
+                "backoff_level": self._current_level(now),
+            }
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_instagram_throttle: InstagramThrottle | None = None
+
+
+def get_instagram_throttle() -> InstagramThrottle:
+    """Return (or create) the global Instagram throttle."""
+    global _instagram_throttle
+    if _instagram_throttle is None:
+        _instagram_throttle = InstagramThrottle(
+            window_seconds=float(os.getenv("INSTAGRAM_RATE_WINDOW_SECONDS", "60")),
+            max_requests=int(os.getenv("INSTAGRAM_MAX_REQUESTS_PER_WINDOW", "20")),
+        )
+    return _instagram_throttle
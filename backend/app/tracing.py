@@ -0,0 +1,306 @@
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job whose trace spans opened on the event loop belong to.  Set by
+# convert_video so shared helpers (get_video_info) record into the right
+# trace without threading a job id through every call.
+current_job: ContextVar[Optional[str]] = ContextVar("current_job", default=None)
+
+
+class Span:
+    """One timed stage of a job (times are perf_counter seconds)."""
+
+    __slots__ = ("name", "start", "end", "thread", "attrs")
+
+    def __init__(self, name: str, start: float, thread: str, attrs: Optional[dict] = None):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.thread = thread
+        self.attrs = attrs or {}
+
+    def close(self):
+        self.end = time.perf_counter()
+
+
+class JobTrace:
+    """Spans (and an optional profile) recorded for one job."""
+
+    def __init__(self, job_id: str, profile: bool):
+        self.job_id = job_id
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.profile = profile
+        self.profile_text: Optional[str] = None
+        # Spans are appended from the event loop and from worker threads
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        def ms(t: float) -> float:
+            return round((t - self.start) * 1000, 2)
+
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "job_id": self.job_id,
+            "started_at": self.wall_start,
+            "total_ms": ms(self.end) if self.end else None,
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": ms(s.start),
+                    "duration_ms": round((s.end - s.start) * 1000, 2) if s.end else None,
+                    "thread": s.thread,
+                    **({"attrs": s.attrs} if s.attrs else {}),
+                }
+                for s in spans
+            ],
+            "profile": self.profile_text,
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """Chrome trace-event format — open in chrome://tracing or Perfetto."""
+        threads: Dict[str, int] = {}
+        events = []
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            if s.end is None:
+                continue
+            tid = threads.setdefault(s.thread, len(threads) + 1)
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "ts": round((s.start - self.start) * 1e6),
+                "dur": round((s.end - s.start) * 1e6),
+                "pid": 1,
+                "tid": tid,
+                "args": s.attrs,
+            })
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for name, tid in threads.items()
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"job_id": self.job_id}}
+
+
+class _HookSpans:
+    """Turns yt-dlp download/postprocessor hook calls into spans.
+
+    Each downloaded stream (video, audio, thumbnail) gets a span from its
+    first 'downloading' callback to 'finished'; each postprocessor (merger,
+    FFmpegExtractAudio, EmbedThumbnail, ...) from 'started' to 'finished'.
+    """
+
+    def __init__(self, tracer: "Tracer", job_id: str):
+        self.tracer = tracer
+        self.job_id = job_id
+        self._open: Dict[str, Span] = {}
+
+    def on_download(self, d: dict):
+        key = "download " + os.path.basename(d.get('filename') or '')
+        status = d.get('status')
+        if status == 'downloading' and key not in self._open:
+            self._open[key] = self.tracer.begin(self.job_id, key)
+        elif status in ('finished', 'error') and key in self._open:
+            span = self._open.pop(key)
+            span.attrs["bytes"] = d.get('total_bytes') or d.get('downloaded_bytes')
+            span.close()
+
+    def on_postprocess(self, d: dict):
+        key = "postprocess " + (d.get('postprocessor') or '?')
+        status = d.get('status')
+        if status == 'started':
+            self._open[key] = self.tracer.begin(self.job_id, key)
+        elif status == 'finished' and key in self._open:
+            self._open.pop(key).close()
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack every *interval* seconds.
+
+    Reads the stack with sys._current_frames() from a separate thread, so
+    the sampled thread runs at full speed between samples.  Output is in the
+    folded ("collapsed stack") format flamegraph tools read.
+    """
+
+    def __init__(self, target_ident: int, interval: float):
+        super().__init__(name="trace-sampler", daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class Tracer:
+    """Per-job timing spans, kept in memory for the last ``max_traces`` jobs.
+
+    Spans cover queueing, metadata extraction (and the wait for a worker
+    thread), each downloaded stream, each yt-dlp postprocessor, image work,
+    locating and publishing the artifact.  Finished traces can also be
+    written to ``trace_dir`` as Chrome trace JSON.
+
+    A ``profile_rate`` fraction of jobs additionally run their blocking
+    download/postprocess work under a profiler: cProfile (exact, heavier) or
+    a stack sampler (cheap, statistical).
+    """
+
+    def __init__(
+        self,
+        max_traces: int = 500,
+        trace_dir: Optional[Path] = None,
+        profile_rate: float = 0.0,
+        profile_mode: str = "sample",
+        sample_interval: float = 0.01,
+    ):
+        self.max_traces = max_traces
+        self.trace_dir = trace_dir
+        self.profile_rate = profile_rate
+        self.profile_mode = profile_mode
+        self.sample_interval = sample_interval
+        self._traces: "OrderedDict[str, JobTrace]" = OrderedDict()
+        if trace_dir:
+            trace_dir.mkdir(parents=True, exist_ok=True)
+
+    # ── Trace lifecycle ───────────────────────────────────────────────────────
+    def start_trace(self, job_id: str) -> JobTrace:
+        trace = JobTrace(job_id, profile=random.random() < self.profile_rate)
+        self._traces[job_id] = trace
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+        return trace
+
+    def get(self, job_id: str) -> Optional[JobTrace]:
+        return self._traces.get(job_id)
+
+    async def finish(self, job_id: str):
+        """Close a job's trace and, if configured, write it to disk."""
+        trace = self._traces.get(job_id)
+        if trace is None:
+            return
+        trace.end = time.perf_counter()
+        if self.trace_dir:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write, trace)
+
+    def _write(self, trace: JobTrace):
+        try:
+            path = self.trace_dir / f"{trace.job_id}.trace.json"
+            path.write_text(json.dumps(trace.to_chrome_trace()))
+            if trace.profile_text:
+                suffix = ".folded" if self.profile_mode == "sample" else ".profile.txt"
+                (self.trace_dir / f"{trace.job_id}{suffix}").write_text(trace.profile_text)
+        except OSError as e:
+            logger.error(f"Failed to write trace for job {trace.job_id}: {e}")
+
+    # ── Spans ─────────────────────────────────────────────────────────────────
+    def begin(self, job_id: Optional[str], name: str, **attrs) -> Span:
+        """Open a span; the caller closes it.  Not recorded when untraced."""
+        span = Span(name, time.perf_counter(), threading.current_thread().name, attrs)
+        trace = self._traces.get(job_id) if job_id else None
+        if trace is not None:
+            trace.add(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, job_id: Optional[str] = None, **attrs):
+        """Time the body as a span of *job_id* (default: the current job).
+
+        Usable on the event loop, around awaits, and in worker threads.
+        """
+        span = self.begin(job_id or current_job.get(), name, **attrs)
+        try:
+            yield span
+        finally:
+            span.close()
+
+    def hooks(self, job_id: str) -> _HookSpans:
+        """yt-dlp hook adapters recording download/postprocessor spans."""
+        return _HookSpans(self, job_id)
+
+    # ── Profiling ─────────────────────────────────────────────────────────────
+    def profiled(self, job_id: str, fn: Callable) -> Callable:
+        """Wrap *fn* (run in a worker thread) in the profiler if this job was
+        sampled for profiling; otherwise return *fn* unchanged."""
+        trace = self._traces.get(job_id)
+        if trace is None or not trace.profile:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            if self.profile_mode == "cprofile":
+                profiler = cProfile.Profile()
+                try:
+                    return profiler.runcall(fn, *args, **kwargs)
+                finally:
+                    out = io.StringIO()
+                    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+                    trace.profile_text = out.getvalue()
+            sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.profile_text = sampler.stop()
+
+        return wrapper
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_tracer: Tracer | None = None
+
+
+def debug_endpoints_enabled() -> bool:
+    return os.getenv("DEBUG_TRACE_ENDPOINT", "false").lower() in ("1", "true", "yes")
+
+
+def get_tracer() -> Tracer:
+    """Return (or create) the global job tracer."""
+    global _tracer
+    if _tracer is None:
+        trace_dir = os.getenv("TRACE_DIR")
+        _tracer = Tracer(
+            max_traces=int(os.getenv("TRACE_MAX_JOBS", "500")),
+            trace_dir=Path(trace_dir) if trace_dir else None,
+            profile_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            profile_mode=os.getenv("PROFILE_MODE", "sample").lower(),
+            sample_interval=float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10")) / 1000,
+        )
+    return _tracer
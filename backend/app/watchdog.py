@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Set
+
+from .costs import estimate_job_cost
+from .models import FormatType
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadAborted(Exception):
+    """Raised inside the worker thread (from the progress hook) to unwind a
+    yt-dlp download that the watchdog has given up on."""
+
+
+class DownloadStalled(Exception):
+    """Raised on the event loop when the watchdog aborts a job.
+
+    *worker_exited* tells the caller whether the worker thread actually
+    unwound.  If it did, the job can be retried safely; if it is still stuck
+    in a blocking socket read, retrying would race the old thread on the same
+    output files, so the job must be failed instead.
+    """
+
+    def __init__(self, reason: str, worker_exited: bool):
+        super().__init__(reason)
+        self.reason = reason
+        self.worker_exited = worker_exited
+
+
+class _JobWatch:
+    """Per-job bookkeeping, mutated from the worker thread's progress hook."""
+
+    __slots__ = (
+        "started", "deadline", "downloading", "last_bytes",
+        "last_filename", "last_progress_at", "abort_reason",
+        "paused_since",
+    )
+
+    def __init__(self, deadline_seconds: float):
+        now = time.monotonic()
+        self.started = now
+        self.deadline = now + deadline_seconds
+        self.downloading = False
+        self.last_bytes = -1
+        self.last_filename: Optional[str] = None
+        self.last_progress_at = now
+        self.abort_reason: Optional[str] = None
+        self.paused_since: Optional[float] = None
+
+
+class DownloadWatchdog:
+    """Detects stalled or overrunning downloads and aborts them.
+
+    The progress hook feeds downloaded byte counts in via on_progress().  A
+    job is considered *stalled* when it is in the downloading stage and its
+    byte count has not moved for ``stall_seconds``; it is *overdue* when it
+    runs past a deadline scaled by duration and format (see costs.py).
+
+    A thread can't be killed from the outside, so aborting works in two
+    halves: supervise() flags the job and stops waiting for it, and the next
+    progress hook call inside the worker raises DownloadAborted so yt-dlp
+    unwinds.  Extraction doesn't report bytes, so only the deadline applies
+    to it.  ffmpeg postprocessing can't be interrupted that way at all (no
+    hooks fire while it runs), so the deadline is suspended while a
+    postprocessor runs instead of failing a job whose worker would carry
+    on encoding.  It is also suspended while the worker waits in the
+    Instagram throttle (see paused()), which is our own delay, not the
+    download's.
+    """
+
+    def __init__(
+        self,
+        stall_seconds: float = 90,
+        base_deadline: float = 300,
+        seconds_per_cost: float = 0.5,
+        poll_interval: float = 5,
+        grace_seconds: float = 15,
+    ):
+        self.stall_seconds = stall_seconds
+        self.base_deadline = base_deadline
+        self.seconds_per_cost = seconds_per_cost
+        self.poll_interval = poll_interval
+        self.grace_seconds = grace_seconds
+        self._watches: Dict[str, _JobWatch] = {}
+        self._lock = threading.Lock()
+
+    def deadline_for(
+        self, duration: float, format_type: FormatType, extra_formats: Iterable[FormatType] = (),
+    ) -> float:
+        """Total runtime budget (seconds) for one download attempt."""
+        cost = estimate_job_cost(duration, format_type, extra_formats)
+        return self.base_deadline + cost * self.seconds_per_cost
+
+    def start(
+        self, job_id: str, duration: float, format_type: FormatType, extra_formats: Iterable[FormatType] = (),
+    ):
+        """Begin watching a new download attempt for *job_id*."""
+        with self._lock:
+            self._watches[job_id] = _JobWatch(self.deadline_for(duration, format_type, extra_formats))
+
+    def finish(self, job_id: str):
+        """Stop watching *job_id* (call once the attempt is over)."""
+        with self._lock:
+            self._watches.pop(job_id, None)
+
+    def watched_ids(self) -> Set[str]:
+        """Ids of the jobs with a download attempt in progress."""
+        with self._lock:
+            return set(self._watches)
+
+    def on_progress(self, job_id: str, d: dict):
+        """Record a yt-dlp progress callback.  Runs in the worker thread.
+
+        Raises DownloadAborted if the watchdog has already given up on the
+        job, which makes yt-dlp abandon the download.
+        """
+        watch = self._watches.get(job_id)
+        if watch is None:
+            return
+        if watch.abort_reason:
+            raise DownloadAborted(watch.abort_reason)
+
+        status = d.get("status")
+        if status == "downloading":
+            downloaded = d.get("downloaded_bytes") or 0
+            filename = d.get("filename")
+            if (
+                not watch.downloading
+                or downloaded != watch.last_bytes
+                or filename != watch.last_filename
+            ):
+                watch.last_progress_at = time.monotonic()
+            watch.downloading = True
+            watch.last_bytes = downloaded
+            watch.last_filename = filename
+        elif status in ("finished", "error"):
+            # Either the next stream starts (and will report bytes again) or
+            # ffmpeg takes over — stall detection is off until then.
+            watch.downloading = False
+
+    def _pause(self, job_id: str):
+        watch = self._watches.get(job_id)
+        if watch is not None and watch.paused_since is None:
+            watch.paused_since = time.monotonic()
+
+    def _resume(self, job_id: str):
+        watch = self._watches.get(job_id)
+        if watch is not None and watch.paused_since is not None:
+            watch.deadline += time.monotonic() - watch.paused_since
+            watch.paused_since = None
+
+    @contextmanager
+    def paused(self, job_id: Optional[str]):
+        """Suspend *job_id*'s deadline for the body (a no-op for None)."""
+        if job_id is None:
+            yield
+            return
+        self._pause(job_id)
+        try:
+            yield
+        finally:
+            self._resume(job_id)
+
+    def on_postprocess(self, job_id: str, d: dict):
+        """Record a yt-dlp postprocessor callback.  Runs in the worker thread.
+
+        The deadline is paused between a postprocessor's start and end.
+        """
+        status = d.get("status")
+        if status == "started":
+            self._pause(job_id)
+        elif status in ("finished", "error"):
+            self._resume(job_id)
+
+    def check(self, job_id: str) -> Optional[str]:
+        """Return a reason string if *job_id* should be aborted, else None."""
+        watch = self._watches.get(job_id)
+        if watch is None or watch.paused_since is not None:
+            return None
+        now = time.monotonic()
+        if now > watch.deadline:
+            return f"exceeded deadline of {int(watch.deadline - watch.started)}s"
+        if watch.downloading and now - watch.last_progress_at > self.stall_seconds:
+            return f"no data received for {int(now - watch.last_progress_at)}s"
+        return None
+
+    async def supervise(self, job_id: str, future: asyncio.Future):
+        """Await *future* (the executor download) while enforcing the limits.
+
+        Returns the future's result, re-raises its exception, or raises
+        DownloadStalled when the watchdog aborts the attempt.
+        """
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=self.poll_interval)
+            if done:
+                return future.result()
+
+            reason = self.check(job_id)
+            if not reason:
+                continue
+
+            watch = self._watches.get(job_id)
+            if watch is not None:
+                watch.abort_reason = reason
+            logger.warning(f"Watchdog aborting job {job_id}: {reason}")
+
+            # Give the worker a moment to hit its next progress hook and unwind.
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.grace_seconds)
+                # Finished on its own just as we gave up on it — keep the result.
+                return result
+            except asyncio.TimeoutError:
+                raise DownloadStalled(reason, worker_exited=False)
+            except Exception:
+                raise DownloadStalled(reason, worker_exited=True)
+
+
+# ── Singleton ──────────────────────────────────────────────────────────────────
+_watchdog: DownloadWatchdog | None = None
+
+
+def get_watchdog() -> DownloadWatchdog:
+    """Return (or create) the global watchdog, configured from the environment."""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = DownloadWatchdog(
+            stall_seconds=float(os.getenv("WATCHDOG_STALL_SECONDS", "90")),
+            base_deadline=float(os.getenv("WATCHDOG_BASE_DEADLINE_SECONDS", "300")),
+            seconds_per_cost=float(os.getenv("WATCHDOG_SECONDS_PER_COST", "0.5")),
+        )
+    return _watchdog
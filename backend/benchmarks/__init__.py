@@ -0,0 +1 @@
+"""Offline end-to-end benchmark suite — see run.py."""
@@ -0,0 +1,132 @@
+"""Synthetic test media for the benchmark suite.
+
+Everything is generated locally with ffmpeg (test pattern video plus a sine
+tone), so runs are reproducible and never touch YouTube or Instagram:
+
+    <root>/source.mp4          progressive H.264/AAC file
+    <root>/poster.jpg          og:image for the watch page
+    <root>/watch.html          page with og: tags and a <video> element
+    <root>/hls/master.m3u8     HLS, one variant per rendition
+    <root>/dash/manifest.mpd   DASH, separate video and audio representations
+
+yt-dlp's generic extractor handles all of them: the page through its
+html5 <video> and og:image parsing, the manifests directly.
+"""
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Tuple
+
+# (height, video bitrate) per rendition of the HLS/DASH variants
+RENDITIONS: List[Tuple[int, str]] = [(360, "800k"), (720, "2500k"), (1080, "5000k")]
+
+_MARKER = ".generated.json"
+
+_WATCH_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>Benchmark clip</title>
+  <meta property="og:title" content="Benchmark clip">
+  <meta property="og:image" content="{poster}">
+  <meta property="og:type" content="video.other">
+</head>
+<body>
+  <video controls poster="poster.jpg">
+    <source src="source.mp4" type="video/mp4">
+  </video>
+</body>
+</html>
+"""
+
+
+def _ffmpeg(*args: str):
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *args],
+        check=True,
+    )
+
+
+def _lavfi_inputs(duration: int, height: int) -> List[str]:
+    width = height * 16 // 9
+    return [
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+    ]
+
+
+def _generate_hls(root: Path, source: Path):
+    hls = root / "hls"
+    hls.mkdir()
+    master = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for height, bitrate in RENDITIONS:
+        width = height * 16 // 9
+        _ffmpeg(
+            "-i", str(source),
+            "-vf", f"scale={width}:{height}",
+            "-c:v", "libx264", "-preset", "veryfast", "-b:v", bitrate,
+            "-c:a", "aac", "-b:a", "128k",
+            "-f", "hls", "-hls_time", "4", "-hls_playlist_type", "vod",
+            "-hls_segment_filename", str(hls / f"{height}p_%03d.ts"),
+            str(hls / f"{height}p.m3u8"),
+        )
+        bandwidth = int(bitrate.rstrip("k")) * 1000 + 128_000
+        master.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height}")
+        master.append(f"{height}p.m3u8")
+    (hls / "master.m3u8").write_text("\n".join(master) + "\n")
+
+
+def _generate_dash(root: Path, source: Path):
+    dash = root / "dash"
+    dash.mkdir()
+    args = ["-i", str(source)]
+    for _ in RENDITIONS:
+        args += ["-map", "0:v"]
+    args += ["-map", "0:a", "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-b:a", "128k"]
+    for i, (height, bitrate) in enumerate(RENDITIONS):
+        args += [f"-s:v:{i}", f"{height * 16 // 9}x{height}", f"-b:v:{i}", bitrate]
+    args += [
+        "-f", "dash", "-seg_duration", "4",
+        "-use_template", "1", "-use_timeline", "1",
+        "-adaptation_sets", "id=0,streams=v id=1,streams=a",
+        str(dash / "manifest.mpd"),
+    ]
+    _ffmpeg(*args)
+
+
+def generate_media(root: Path, duration: int = 30, force: bool = False) -> Path:
+    """Create the test media under *root* (reused if already generated with
+    the same parameters).  Returns *root*."""
+    params = {"duration": duration, "renditions": [list(r) for r in RENDITIONS]}
+    marker = root / _MARKER
+    if not force and marker.exists() and json.loads(marker.read_text()) == params:
+        return root
+
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is required to generate benchmark media")
+    if root.exists():
+        if not marker.exists() and any(root.iterdir()):
+            raise RuntimeError(f"{root} is not empty and wasn't created by the benchmark")
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    top_height = RENDITIONS[-1][0]
+    source = root / "source.mp4"
+    _ffmpeg(
+        *_lavfi_inputs(duration, top_height),
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-shortest", "-movflags", "+faststart",
+        str(source),
+    )
+    _ffmpeg("-i", str(source), "-frames:v", "1", "-q:v", "3", str(root / "poster.jpg"))
+    _generate_hls(root, source)
+    _generate_dash(root, source)
+
+    marker.write_text(json.dumps(params))
+    return root
+
+
+def write_watch_page(root: Path, base_url: str):
+    """Write the watch page; og:image must be absolute, so it needs the
+    server's address."""
+    (root / "watch.html").write_text(_WATCH_PAGE.format(poster=f"{base_url}/poster.jpg"))
@@ -0,0 +1,396 @@
+"""Offline end-to-end benchmark for the conversion API.
+
+Starts a local media server and the real app under uvicorn, then for every
+(format, source) scenario runs N jobs at the given concurrency through the
+same calls the frontend makes:
+
+    /api/info -> /api/convert -> /api/status (polled) -> /api/download
+
+and reports throughput, latency percentiles, server CPU time per job and
+peak RSS (app process plus its ffmpeg children).  Results can be saved as a
+baseline and later runs compared against it.
+
+Run from backend/ (requires ffmpeg; Linux, for /proc process stats):
+
+    python -m benchmarks.run --jobs 20 --concurrency 4
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .media import generate_media, write_watch_page
+from .server import MediaServer
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Media each source kind points the app at
+SOURCES = {
+    "page": "watch.html",       # generic extractor: <video> + og:image
+    "hls": "hls/master.m3u8",
+    "dash": "dash/manifest.mpd",
+}
+DEFAULT_FORMATS = ["mp3", "mp4-360", "mp4-720", "image-jpg"]
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# ── Server process stats (/proc) ───────────────────────────────────────────────
+def _proc_stat(pid: int) -> Optional[List[str]]:
+    try:
+        raw = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    # The command name is parenthesised and may contain spaces
+    return raw[raw.rindex(")") + 2:].split()
+
+
+def _cpu_seconds(pid: int) -> float:
+    """utime + stime of *pid* plus its waited-for children (ffmpeg)."""
+    fields = _proc_stat(pid)
+    if fields is None:
+        return 0.0
+    # fields[11..14] are utime, stime, cutime, cstime
+    return sum(int(v) for v in fields[11:15]) / _CLK_TCK
+
+
+def _tree_rss_bytes(root_pid: int) -> int:
+    """Resident memory of *root_pid* and all its live descendants."""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        fields = _proc_stat(int(entry.name))
+        if fields is None:
+            continue
+        pid = int(entry.name)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * _PAGE_SIZE
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class _RssSampler(threading.Thread):
+    def __init__(self, pid: int, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, _tree_rss_bytes(self.pid))
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+# ── App server ─────────────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(workdir: Path, extra_env: Dict[str, str], log_path: Path) -> Tuple[subprocess.Popen, str]:
+    """Launch the app under uvicorn with its state in *workdir* and its
+    output in *log_path*."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DOWNLOAD_DIR": str(workdir / "downloads"),
+        "JOB_JOURNAL_PATH": str(workdir / "jobs.sqlite3"),
+        "LOG_LEVEL": "warning",
+        **extra_env,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=str(BACKEND_DIR),
+        env=env,
+        stdout=log_path.open("wb"),
+        stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited during startup, see {log_path}")
+        try:
+            if httpx.get(f"{base_url}/api/version", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"app did not become ready within 30s, see {log_path}")
+
+
+# ── Load generation ────────────────────────────────────────────────────────────
+async def _run_job(client: httpx.AsyncClient, url: str, fmt: str,
+                   poll_interval: float, timeout: float) -> dict:
+    result = {"ok": False}
+    started = time.perf_counter()
+    try:
+        r = await client.get("/api/info", params={"url": url}, follow_redirects=True)
+        r.raise_for_status()
+        result["info_s"] = time.perf_counter() - started
+
+        r = await client.post("/api/convert", json={"url": url, "format": fmt})
+        r.raise_for_status()
+        job_id = r.json()["job_id"]
+
+        deadline = time.perf_counter() + timeout
+        while True:
+            status = (await client.get(f"/api/status/{job_id}")).json()
+            if status["status"] in ("completed", "failed"):
+                break
+            if time.perf_counter() > deadline:
+                result["error"] = "timed out"
+                return result
+            await asyncio.sleep(poll_interval)
+        if status["status"] == "failed":
+            result["error"] = status.get("error")
+            return result
+        result["convert_s"] = time.perf_counter() - started - result["info_s"]
+
+        size = 0
+        download_started = time.perf_counter()
+        async with client.stream("GET", f"/api/download/{job_id}") as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                size += len(chunk)
+        result["download_s"] = time.perf_counter() - download_started
+        result["bytes"] = size
+        result["ok"] = size > 0
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        result["total_s"] = time.perf_counter() - started
+    return result
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_scenario(app_url: str, app_pid: int, media_url: str, fmt: str,
+                       jobs: int, concurrency: int, poll_interval: float,
+                       timeout: float, unique_urls: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        async def one(i: int):
+            # A distinct path per job (watch-<n>.html, served by the media
+            # server as an alias of watch.html) defeats the app's metadata
+            # and thumbnail caches.
+            url = media_url
+            if unique_urls:
+                stem, _, ext = media_url.rpartition(".")
+                url = f"{stem}-{i}-{time.time_ns()}.{ext}"
+            async with semaphore:
+                return await _run_job(client, url, fmt, poll_interval, timeout)
+
+        cpu_before = _cpu_seconds(app_pid)
+        sampler = _RssSampler(app_pid)
+        sampler.start()
+        wall_started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(jobs)))
+        wall = time.perf_counter() - wall_started
+        peak_rss = sampler.stop()
+        cpu = _cpu_seconds(app_pid) - cpu_before
+
+    ok = [r for r in results if r["ok"]]
+    totals = [r["total_s"] for r in ok]
+    errors = sorted({str(r.get("error")) for r in results if not r["ok"]})
+    return {
+        "jobs": jobs,
+        "succeeded": len(ok),
+        "failed": jobs - len(ok),
+        "errors": errors[:5],
+        "wall_s": round(wall, 3),
+        "throughput_jobs_per_s": round(len(ok) / wall, 4) if wall else None,
+        "latency_s": {
+            "p50": _percentile(totals, 50),
+            "p90": _percentile(totals, 90),
+            "p99": _percentile(totals, 99),
+            "mean_info": statistics.fmean(r["info_s"] for r in ok) if ok else None,
+            "mean_convert": statistics.fmean(r["convert_s"] for r in ok) if ok else None,
+            "mean_download": statistics.fmean(r["download_s"] for r in ok) if ok else None,
+        },
+        "cpu_s_per_job": round(cpu / len(ok), 4) if ok else None,
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+    }
+
+
+# ── Reporting ──────────────────────────────────────────────────────────────────
+def _fmt(value: Optional[float], digits: int = 2) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_report(results: Dict[str, dict]):
+    header = f"{'scenario':<22}{'ok':>6}{'jobs/s':>9}{'p50 s':>9}{'p90 s':>9}{'p99 s':>9}{'cpu s/job':>11}{'rss MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        lat = r["latency_s"]
+        print(
+            f"{name:<22}{r['succeeded']:>3}/{r['jobs']:<2}"
+            f"{_fmt(r['throughput_jobs_per_s'], 3):>9}"
+            f"{_fmt(lat['p50']):>9}{_fmt(lat['p90']):>9}{_fmt(lat['p99']):>9}"
+            f"{_fmt(r['cpu_s_per_job'], 3):>11}{_fmt(r['peak_rss_mb'], 1):>9}"
+        )
+        for error in r["errors"]:
+            print(f"    error: {error}")
+
+
+# Metric path, and whether higher is better
+_COMPARED = [
+    (("throughput_jobs_per_s",), True),
+    (("latency_s", "p50"), False),
+    (("latency_s", "p90"), False),
+    (("cpu_s_per_job",), False),
+    (("peak_rss_mb",), False),
+]
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """Print changes against *baseline*; False if anything regressed by
+    more than *tolerance* (a fraction)."""
+    passed = True
+    print(f"\nCompared with baseline (tolerance {tolerance:.0%}):")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name}: not in baseline")
+            continue
+        for path, higher_is_better in _COMPARED:
+            new, old = r, base
+            for key in path:
+                new, old = new.get(key), (old or {}).get(key)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            passed &= not regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {name:<22}{'.'.join(path):<24}{old:>10.3f} -> {new:>10.3f} ({change:+.1%}){flag}")
+    return passed
+
+
+# ── Entry point ────────────────────────────────────────────────────────────────
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", default=",".join(DEFAULT_FORMATS),
+                        help="comma-separated FormatType values")
+    parser.add_argument("--sources", default="page,hls,dash",
+                        help=f"comma-separated media sources ({', '.join(SOURCES)})")
+    parser.add_argument("--jobs", type=int, default=10, help="jobs per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--duration", type=int, default=30, help="test clip length in seconds")
+    parser.add_argument("--bandwidth", type=float, default=0,
+                        help="pace each media response to this many MB/s (0 = unlimited)")
+    parser.add_argument("--media-dir", type=Path, default=BACKEND_DIR / "benchmarks" / ".media")
+    parser.add_argument("--app-log", type=Path, default=BACKEND_DIR / "benchmarks" / "app.log",
+                        help="where the app's output goes")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=600, help="per-job timeout in seconds")
+    parser.add_argument("--same-url", action="store_true",
+                        help="reuse one URL per scenario (measures the cached path)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app (repeatable)")
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--save-baseline", type=Path, help="write results as a baseline")
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed regression vs. baseline (fraction, default 0.10)")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        parser.error(f"unknown source(s): {', '.join(unknown)}")
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    print(f"Generating media in {args.media_dir} ...")
+    generate_media(args.media_dir, duration=args.duration)
+    media_server = MediaServer(args.media_dir, bandwidth=int(args.bandwidth * 2**20) or None)
+    media_server.start()
+    write_watch_page(args.media_dir, media_server.base_url)
+
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="reelo-bench-") as workdir:
+        app, app_url = start_app(Path(workdir), extra_env, args.app_log)
+        try:
+            for fmt in formats:
+                for source in sources:
+                    # Image formats come from og:image; only the page has one
+                    if fmt.startswith("image-") and source != "page":
+                        continue
+                    name = f"{fmt}@{source}"
+                    print(f"Running {name} ({args.jobs} jobs, concurrency {args.concurrency}) ...")
+                    results[name] = asyncio.run(run_scenario(
+                        app_url, app.pid, f"{media_server.base_url}/{SOURCES[source]}", fmt,
+                        args.jobs, args.concurrency, args.poll_interval, args.timeout,
+                        unique_urls=not args.same_url,
+                    ))
+        finally:
+            app.terminate()
+            app.wait(timeout=30)
+            media_server.stop()
+
+    print()
+    print_report(results)
+
+    document = {
+        "settings": {
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "bandwidth_mb_s": args.bandwidth,
+            "env": extra_env,
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(document, indent=2))
+            print(f"\nWrote {path}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Local HTTP server standing in for the video sites during benchmarks."""
+import io
+import os
+import posixpath
+import re
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+# /watch-<n>.html, /poster-<n>.jpg, /hls/master-<n>.m3u8, ... -> the file without "-<n>"
+_ALIAS = re.compile(r"^(?P<stem>.+?)-(?P<n>\d[\d-]*)(?P<ext>\.[^./]+)$")
+
+
+class _MediaHandler(SimpleHTTPRequestHandler):
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        ".m3u8": "application/vnd.apple.mpegurl",
+        ".mpd": "application/dash+xml",
+        ".ts": "video/mp2t",
+        ".m4s": "video/iso.segment",
+    }
+
+    # Set per server: bytes/second each response is paced to (None = unlimited)
+    bandwidth: Optional[int] = None
+
+    def translate_path(self, path):
+        resolved = super().translate_path(path)
+        if os.path.exists(resolved):
+            return resolved
+        head, name = os.path.split(resolved)
+        match = _ALIAS.match(name)
+        if match:
+            target = os.path.join(head, match["stem"] + match["ext"])
+            if os.path.isfile(target):
+                return target
+        return resolved
+
+    def send_head(self):
+        match = _ALIAS.match(posixpath.basename(urlsplit(self.path).path))
+        if not match or match["ext"] != ".html":
+            return super().send_head()
+        # An aliased page points at the matching poster alias, so each job's
+        # og:image URL is as unique as the page's.
+        try:
+            page = Path(self.translate_path(self.path)).read_text()
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        body = page.replace("poster.jpg", f"poster-{match['n']}.jpg").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def copyfile(self, source, outputfile):
+        if not self.bandwidth:
+            return super().copyfile(source, outputfile)
+        chunk = max(self.bandwidth // 20, 16 * 1024)
+        while True:
+            started = time.monotonic()
+            data = source.read(chunk)
+            if not data:
+                return
+            outputfile.write(data)
+            # Sleep off whatever is left of this chunk's time budget
+            time.sleep(max(0.0, len(data) / self.bandwidth - (time.monotonic() - started)))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MediaServer:
+    """Serves a media directory on 127.0.0.1 from a background thread.
+
+    Any file can also be requested as ``<name>-<n>.<ext>`` (e.g.
+    ``/watch-3.html``, ``/hls/master-3.m3u8``), so the benchmark can give
+    every job a unique path that still maps to the same media.  A query
+    string alone is not enough: the app's generic extractor derives the
+    video id, and with it the thumbnail cache key, from the path.  An
+    aliased watch page links ``poster-<n>.jpg`` to match.  *bandwidth*
+    (bytes/s per response) optionally simulates a slower upstream.
+    """
+
+    def __init__(self, root: Path, bandwidth: Optional[int] = None):
+        handler = type("Handler", (_MediaHandler,), {"bandwidth": bandwidth})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=str(root)))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="media-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
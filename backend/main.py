@@ -10,11 +10,17 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Load environment variables before importing the app modules — some of them
+# size their worker pools from the environment at import time.
+load_dotenv()
+
 from app.routes import router
 from app.cleanup import get_cleanup_service
-
-# Load environment variables
-load_dotenv()
+from app.concurrency import get_concurrency_controller
+from app.images import close_http_client
+from app.cluster import close_cluster, get_cluster
+from app.converter import resume_jobs
+from app.journal import get_journal
 
 # Configure logging
 logging.basicConfig(
@@ -32,24 +38,42 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info("Starting Reelo API...")
+
+    # Validate the cluster config up front: a node with a bad CLUSTER_SELF
+    # must not start and serve outside the ownership ring.
+    get_cluster()
     
     # Create downloads directory
     download_dir = os.getenv("DOWNLOAD_DIR", "./downloads")
     Path(download_dir).mkdir(exist_ok=True)
     
     # Start cleanup service
+    retention_hours = int(os.getenv("FILE_RETENTION_HOURS", "1"))
     cleanup_service = get_cleanup_service(
         download_dir=download_dir,
-        retention_hours=int(os.getenv("FILE_RETENTION_HOURS", "1"))
+        retention_hours=retention_hours
     )
     
     import asyncio
+    
+    # Restore journaled jobs and resume the ones a restart interrupted
+    resume_jobs(
+        max_age_hours=retention_hours * 2,
+        max_attempts=int(os.getenv("JOB_MAX_RESUMES", "3")),
+    )
     cleanup_task = asyncio.create_task(
         cleanup_service.start(
             interval_minutes=int(os.getenv("CLEANUP_INTERVAL_MINUTES", "30"))
         )
     )
     
+    # Start adaptive concurrency controller
+    concurrency_controller = None
+    concurrency_task = None
+    if os.getenv("ADAPTIVE_CONCURRENCY", "true").lower() in ("1", "true", "yes"):
+        concurrency_controller = get_concurrency_controller()
+        concurrency_task = asyncio.create_task(concurrency_controller.start())
+    
     logger.info("Reelo API started successfully")
     
     yield
@@ -62,6 +86,16 @@ async def lifespan(app: FastAPI):
         await cleanup_task
     except asyncio.CancelledError:
         pass
+    if concurrency_task:
+        concurrency_controller.stop()
+        concurrency_task.cancel()
+        try:
+            await concurrency_task
+        except asyncio.CancelledError:
+            pass
+    await close_http_client()
+    await close_cluster()
+    get_journal().close()
     logger.info("Reelo API stopped")
 
 
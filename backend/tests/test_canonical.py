@@ -0,0 +1,57 @@
+import pytest
+
+from app.canonical import CanonicalKey, canonical_url, canonicalize
+
+_YOUTUBE = CanonicalKey("youtube", "dQw4w9WgXcQ")
+_INSTAGRAM = CanonicalKey("instagram", "C1a2B3c4D5e")
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtube.com/watch?v=dQw4w9WgXcQ&list=PL123&index=4",
+    "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+    "https://music.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtu.be/dQw4w9WgXcQ?si=tracking",
+    "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube.com/live/dQw4w9WgXcQ",
+    "www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "  https://YouTube.com/watch?v=dQw4w9WgXcQ  ",
+])
+def test_youtube_shapes(url):
+    assert canonicalize(url) == _YOUTUBE
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.instagram.com/p/C1a2B3c4D5e/",
+    "https://www.instagram.com/reel/C1a2B3c4D5e/?igsh=abc",
+    "https://instagram.com/reels/C1a2B3c4D5e",
+    "https://www.instagram.com/tv/C1a2B3c4D5e/",
+    "https://m.instagram.com/p/C1a2B3c4D5e/",
+    "https://www.instagram.com/someone/reel/C1a2B3c4D5e/",
+    "https://instagr.am/p/C1a2B3c4D5e/",
+])
+def test_instagram_shapes(url):
+    assert canonicalize(url) == _INSTAGRAM
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/watch?v=dQw4w9WgXcQ",
+    "https://www.youtube.com/watch?v=tooshort",
+    "https://www.youtube.com/channel/UC123",
+    "https://www.instagram.com/someone/",
+    "not a url",
+])
+def test_unrecognised_urls(url):
+    assert canonicalize(url) is None
+
+
+def test_canonical_url():
+    assert canonical_url("https://youtu.be/dQw4w9WgXcQ") == "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert canonical_url("https://www.instagram.com/reel/C1a2B3c4D5e/") == "https://www.instagram.com/p/C1a2B3c4D5e/"
+    assert canonical_url("https://example.com/clip.mp4") == "https://example.com/clip.mp4"
+
+
+def test_key_str():
+    assert str(_YOUTUBE) == "youtube:dQw4w9WgXcQ"
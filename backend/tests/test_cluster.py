@@ -0,0 +1,69 @@
+import pytest
+
+from app.cluster import HashRing, parse_nodes, routing_key
+
+_KEYS = [f"youtube:video{i:05d}" for i in range(2000)]
+
+
+def _assignments(nodes):
+    ring = HashRing(nodes)
+    return {key: ring.node_for(key) for key in _KEYS}
+
+
+def test_ring_is_deterministic():
+    assert _assignments(["a", "b", "c"]) == _assignments(["c", "a", "b"])
+
+
+def test_ring_spreads_keys_over_all_nodes():
+    owners = _assignments(["a", "b", "c"]).values()
+    for node in ("a", "b", "c"):
+        # 64 vnodes keep every share well away from zero
+        assert list(owners).count(node) > len(_KEYS) / 6
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = _assignments(["a", "b", "c"])
+    after = _assignments(["a", "b", "c", "d"])
+    moved = [key for key in _KEYS if before[key] != after[key]]
+    assert moved
+    assert all(after[key] == "d" for key in moved)
+    assert len(moved) < len(_KEYS) / 2
+
+
+def test_removing_a_node_only_moves_its_keys():
+    before = _assignments(["a", "b", "c"])
+    after = _assignments(["a", "b"])
+    for key in _KEYS:
+        if before[key] != "c":
+            assert after[key] == before[key]
+
+
+def test_empty_ring_rejected():
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_routing_key_unifies_link_shapes():
+    assert routing_key("https://youtu.be/dQw4w9WgXcQ") == routing_key(
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ"
+    )
+    assert routing_key(" https://example.com/clip.mp4 ") == "https://example.com/clip.mp4"
+
+
+def test_parse_nodes():
+    nodes = parse_nodes("a=http://10.0.0.1:8000/, b = http://10.0.0.2:8000,")
+    assert [(n.name, n.url) for n in nodes] == [("a", "http://10.0.0.1:8000"), ("b", "http://10.0.0.2:8000")]
+
+    # Bare URLs get the same derived name on every node
+    bare = parse_nodes("http://10.0.0.3:8000")
+    assert bare == parse_nodes("http://10.0.0.3:8000")
+    assert bare[0].name.startswith("n")
+
+
+@pytest.mark.parametrize("spec", [
+    "Node-1=http://10.0.0.1:8000",
+    "a=http://10.0.0.1:8000,a=http://10.0.0.2:8000",
+])
+def test_parse_nodes_rejects_bad_config(spec):
+    with pytest.raises(ValueError):
+        parse_nodes(spec)
@@ -0,0 +1,28 @@
+import pytest
+
+from app.costs import BASE_JOB_COST, combined_weight, estimate_job_cost, format_weight
+from app.models import FormatType
+
+
+def test_single_format_weight():
+    assert combined_weight([FormatType.MP4_720]) == format_weight(FormatType.MP4_720)
+
+
+def test_extra_outputs_count_at_half_weight():
+    # The heaviest format pays for the download, whatever order they come in
+    weight = combined_weight([FormatType.MP3, FormatType.MP4_1080, FormatType.MP4_720])
+    assert weight == pytest.approx(1.5 + 0.5 * (1.0 + 0.5))
+
+
+def test_no_formats_defaults_to_unit_weight():
+    assert combined_weight([]) == 1.0
+
+
+def test_job_cost_scales_with_duration():
+    assert estimate_job_cost(0, FormatType.MP4_720) == BASE_JOB_COST
+    assert estimate_job_cost(100, FormatType.MP4_720) == BASE_JOB_COST + 100
+    assert estimate_job_cost(100, FormatType.MP4_720, [FormatType.MP3]) == BASE_JOB_COST + 125
+
+
+def test_image_jobs_cost_only_the_base():
+    assert estimate_job_cost(3600, FormatType.IMAGE_PNG) == BASE_JOB_COST
@@ -0,0 +1,81 @@
+import asyncio
+
+from app.scheduler import FairScheduler
+
+
+async def _job(scheduler, job_id, client, cost, order, release=None, background=False):
+    async with scheduler.slot(job_id, client, cost, background=background):
+        order.append(job_id)
+        if release is not None:
+            await release.wait()
+
+
+def test_short_jobs_from_other_clients_overtake_a_heavy_client():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_job(scheduler, "a1", "a", 1, order, release))]
+        await asyncio.sleep(0)
+        for job_id, client, cost in (("a2", "a", 100), ("a3", "a", 1), ("b1", "b", 1)):
+            tasks.append(asyncio.create_task(_job(scheduler, job_id, client, cost, order)))
+            await asyncio.sleep(0)
+
+        assert order == ["a1"]
+        assert scheduler.position("b1") == 1
+        assert scheduler.position("a3") == 3
+        release.set()
+        await asyncio.gather(*tasks)
+        return order
+
+    # b1 finishes (in virtual time) first; a's own jobs keep their order
+    assert asyncio.run(scenario()) == ["a1", "b1", "a2", "a3"]
+
+
+def test_background_jobs_never_take_the_last_slot():
+    async def scenario():
+        scheduler = FairScheduler(capacity=2)
+        order = []
+        spec_release, job_release = asyncio.Event(), asyncio.Event()
+        spec1 = asyncio.create_task(_job(scheduler, "spec1", "bg", 1, order, spec_release, background=True))
+        await asyncio.sleep(0)
+        spec2 = asyncio.create_task(_job(scheduler, "spec2", "bg", 1, order, background=True))
+        await asyncio.sleep(0)
+        # The second prefetch waits: it would take the last free slot
+        assert order == ["spec1"]
+        assert scheduler.position("spec2") == 1
+
+        job = asyncio.create_task(_job(scheduler, "job", "c", 50, order, job_release))
+        await asyncio.sleep(0)
+        assert order == ["spec1", "job"]
+        assert scheduler.job_ids() == {"spec1", "spec2", "job"}
+
+        job_release.set()
+        await job
+        assert order == ["spec1", "job"]
+        spec_release.set()
+        await asyncio.gather(spec1, spec2)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["spec1", "job", "spec2"]
+    assert stats["running"] == 0 and stats["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(_job(scheduler, "first", "a", 1, order, release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_job(scheduler, "waiting", "b", 1, order))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.position("waiting") is None
+        release.set()
+        await first
+        return order, scheduler.job_ids()
+
+    order, live = asyncio.run(scenario())
+    assert order == ["first"]
+    assert live == set()
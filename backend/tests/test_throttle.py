@@ -0,0 +1,87 @@
+import pytest
+
+from app import throttle as throttle_module
+from app.throttle import InstagramThrottle, is_rate_limit_error
+
+
+class _Clock:
+    """Fake monotonic clock; sleep() advances it instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(throttle_module.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(throttle_module.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_rate_limit_errors_recognised():
+    assert is_rate_limit_error(Exception("HTTP Error 429: Too Many Requests"))
+    assert is_rate_limit_error(Exception("Please wait a few minutes before you try again"))
+    assert not is_rate_limit_error(Exception("Video unavailable"))
+
+
+def test_healthy_traffic_is_not_delayed(clock):
+    throttle = InstagramThrottle(window_seconds=60, max_requests=5)
+    assert [throttle.acquire() for _ in range(5)] == [0] * 5
+    assert clock.slept == []
+    assert throttle.yt_dlp_sleep_options() == {}
+
+
+def test_full_window_waits_for_oldest_request(clock):
+    throttle = InstagramThrottle(window_seconds=60, max_requests=2)
+    throttle.acquire()
+    clock.now += 10
+    throttle.acquire()
+    assert throttle.acquire() == pytest.approx(50)
+
+
+def test_429_raises_backoff_and_spaces_requests(clock):
+    throttle = InstagramThrottle(window_seconds=60, max_requests=100, backoff_step_seconds=2)
+    assert throttle.record_failure(Exception("HTTP Error 429"))
+    assert throttle.record_failure(Exception("HTTP Error 429"))
+    assert throttle.backoff_level == 2
+    assert throttle.yt_dlp_sleep_options()["sleep_requests"] == 3.0
+
+    throttle.acquire()
+    assert throttle.acquire() == pytest.approx(4)
+
+
+def test_backoff_level_is_capped(clock):
+    throttle = InstagramThrottle(max_backoff_level=3)
+    for _ in range(10):
+        throttle.record_failure(Exception("429 Too Many Requests"))
+    assert throttle.backoff_level == 3
+
+
+def test_occasional_403_does_not_back_off(clock):
+    throttle = InstagramThrottle(window_seconds=60, max_requests=100, error_rate_threshold=0.2)
+    for _ in range(10):
+        throttle.acquire()
+    assert throttle.record_failure(Exception("HTTP Error 403: Forbidden"))
+    assert throttle.backoff_level == 0
+    # ...but a high 403 rate does
+    throttle.record_failure(Exception("HTTP Error 403: Forbidden"))
+    assert throttle.backoff_level == 1
+
+
+def test_backoff_decays_one_level_per_quiet_window(clock):
+    throttle = InstagramThrottle(window_seconds=60)
+    for _ in range(3):
+        throttle.record_failure(Exception("HTTP Error 429"))
+    clock.now += 61
+    assert throttle.backoff_level == 2
+    clock.now += 120
+    assert throttle.backoff_level == 0
@@ -0,0 +1,82 @@
+import pytest
+
+from app import watchdog as watchdog_module
+from app.models import FormatType
+from app.watchdog import DownloadWatchdog
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(watchdog_module.time, "monotonic", clock)
+    return clock
+
+
+def _watchdog() -> DownloadWatchdog:
+    return DownloadWatchdog(stall_seconds=30, base_deadline=100, seconds_per_cost=0)
+
+
+def test_stall_detected_only_while_downloading(clock):
+    watchdog = _watchdog()
+    watchdog.start("job", 60, FormatType.MP3)
+    watchdog.on_progress("job", {"status": "downloading", "downloaded_bytes": 10, "filename": "a"})
+    clock.now += 31
+    assert "no data received" in watchdog.check("job")
+
+    # Between streams (or during ffmpeg) there are no bytes to wait for
+    watchdog.on_progress("job", {"status": "finished", "filename": "a"})
+    assert watchdog.check("job") is None
+
+
+def test_progress_resets_stall_timer(clock):
+    watchdog = _watchdog()
+    watchdog.start("job", 60, FormatType.MP3)
+    watchdog.on_progress("job", {"status": "downloading", "downloaded_bytes": 10, "filename": "a"})
+    clock.now += 20
+    watchdog.on_progress("job", {"status": "downloading", "downloaded_bytes": 20, "filename": "a"})
+    clock.now += 20
+    assert watchdog.check("job") is None
+
+
+def test_deadline(clock):
+    watchdog = _watchdog()
+    watchdog.start("job", 60, FormatType.MP3)
+    clock.now += 99
+    assert watchdog.check("job") is None
+    clock.now += 2
+    assert "exceeded deadline" in watchdog.check("job")
+
+
+def test_paused_time_extends_deadline(clock):
+    watchdog = _watchdog()
+    watchdog.start("job", 60, FormatType.MP3)
+    with watchdog.paused("job"):
+        clock.now += 500
+        assert watchdog.check("job") is None
+    clock.now += 99
+    assert watchdog.check("job") is None
+
+    watchdog.on_postprocess("job", {"status": "started"})
+    clock.now += 500
+    assert watchdog.check("job") is None
+    watchdog.on_postprocess("job", {"status": "finished"})
+    clock.now += 2
+    assert "exceeded deadline" in watchdog.check("job")
+
+
+def test_finished_jobs_are_not_watched(clock):
+    watchdog = _watchdog()
+    watchdog.start("job", 60, FormatType.MP3)
+    assert watchdog.watched_ids() == {"job"}
+    watchdog.finish("job")
+    clock.now += 1000
+    assert watchdog.check("job") is None
+    assert watchdog.watched_ids() == set()